@@ -0,0 +1,15 @@
+"""
+Benchmark suite for the gamY precompiler.
+Synthetic gamY models of increasing size are generated (see generator.py) and expanded,
+timing the precompiler, the saving and reading of savepoints, and each command handler (see runner.py).
+The case-insensitive mappings used for symbol tables can be compared separately (see mappings.py),
+and the savepoints in a folder can be measured (see savepoints.py).
+Run from the gamY folder:
+  python -m benchmark [--scales 1 2 4 8] [--variables 30] [--engine regex|token] [--repeat 3] [--output results.json]
+  python -m benchmark --mappings [--symbols 5000]
+  python -m benchmark --savepoints ../Model/Savepoints
+"""
+from .generator import generate_model, write_model
+from .runner import run_benchmark, report, scaling_exponent
+from .mappings import run_mapping_benchmark, mapping_report
+from .savepoints import measure_savepoints, savepoints_report
@@ -0,0 +1,37 @@
+import argparse
+
+from gamY import ENGINES
+
+from .mappings import run_mapping_benchmark, mapping_report
+from .runner import run_benchmark, report, save_results
+from .savepoints import measure_savepoints, savepoints_report
+
+
+def main():
+  parser = argparse.ArgumentParser(prog="python -m benchmark", description="Benchmark the gamY precompiler on synthetic models")
+  parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4, 8], help="Numbers of model modules to generate")
+  parser.add_argument("--variables", type=int, default=30, help="Number of variables per module")
+  parser.add_argument("--engine", choices=ENGINES, default="regex", help="Precompiler engine")
+  parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions, the best time is reported")
+  parser.add_argument("--output", help="Write results as JSON to this file")
+  parser.add_argument("--mappings", action="store_true", help="Compare the case-insensitive mappings instead")
+  parser.add_argument("--symbols", type=int, default=5000, help="Number of symbols in the mapping benchmark")
+  parser.add_argument("--savepoints", metavar="FOLDER", help="Measure the savepoints in a folder instead")
+  args = parser.parse_args()
+
+  if args.savepoints:
+    results = measure_savepoints(args.savepoints, args.repeat)
+    print(savepoints_report(results))
+  elif args.mappings:
+    results = run_mapping_benchmark(args.symbols)
+    print(mapping_report(results))
+  else:
+    results = run_benchmark(args.scales, args.variables, args.engine, args.repeat)
+    print(report(results))
+  if args.output:
+    save_results(results, args.output)
+    print("Benchmark results: " + args.output)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,216 @@
+"""
+Generator of synthetic gamY models used by the benchmark suite.
+The generated sources mimic the shapes found in the model folder:
+  a settings file defining functions (as in Model/settings.gms and Model/functions.gms),
+  one file per model module with $IF blocks for each stage, containing
+    $GROUP definitions with conditions, group combinations and removals,
+    $BLOCK definitions of equations,
+    $LOOP templates over groups and blocks, and @function calls,
+  and a main file importing the modules stage by stage, defining models, fixing and unfixing groups,
+  and running a homotopy style $FOR loop with nested $IF statements and function calls.
+The size of the model grows linearly with the number of modules and the number of variables per module.
+"""
+import os
+
+#  Sets and conditions cycled through when generating variables
+SETS = ("[t]", "[s_,t]", "[a_,t]", "[d_,s_,t]")
+CONDITIONS = ("", "$(t.val > 2015)", "$(d1K[s_,t])", "$(a15t100[a_] and t.val > 2015)")
+
+#  Variable prefixes and the group each prefix belongs to
+PREFIXES = (("p", "prices"), ("q", "quantities"), ("v", "values"))
+
+
+def variable(prefix, module, i):
+  return f"{prefix}M{module}x{i}"
+
+
+def module_source(module, n_variables):
+  """Return source of a synthetic model module with n_variables endogenous variables"""
+  lines = [
+    "# " + "=" * 118,
+    f"# Module {module}",
+    "# " + "=" * 118,
+    "",
+    '$IF %stage% == "variables":',
+  ]
+  for prefix, kind in PREFIXES:
+    lines.append(f"  $GROUP G_m{module}_{kind}_endo")
+    for i in range(n_variables):
+      if i % len(PREFIXES) == PREFIXES.index((prefix, kind)):
+        sets, conditions = SETS[i % len(SETS)], CONDITIONS[i % len(CONDITIONS)]
+        lines.append(f'    {variable(prefix, module, i)}{sets}{conditions} "{kind.capitalize()} {i} of module {module}"')
+    lines.append('    empty_group_dummy[t] "Dummy variable allowing empty groups"')
+    lines.append("  ;")
+  lines += [
+    f"  $GROUP G_m{module}_endo",
+    *[f"    G_m{module}_{kind}_endo" for _, kind in PREFIXES],
+    "  ;",
+    f"  $GROUP G_m{module}_endo G_m{module}_endo$(tx0[t]); # Restrict endo group to tx0[t]",
+    f"  $GROUP G_m{module}_exogenous_forecast",
+    *[f'    uM{module}x{i}{SETS[i % len(SETS)]} "Parameter {i} of module {module}"' for i in range(n_variables)],
+    "  ;",
+    "$ENDIF",
+    "",
+    '$IF %stage% == "equations":',
+    f"  $BLOCK B_m{module}",
+  ]
+  for i in range(n_variables):
+    prefix = PREFIXES[i % len(PREFIXES)][0]
+    sets = SETS[i % len(SETS)].replace("_", "")
+    lines += [
+      f"    # Equation {i} of module {module}",
+      f"    E_{variable(prefix, module, i)}{sets}$(tx0[t])..",
+      f"      {variable(prefix, module, i)}{sets} =E= uM{module}x{i}{sets} * {variable(prefix, module, (i + 1) % n_variables)}[t];",
+    ]
+  lines += [
+    "  $ENDBLOCK",
+    "$ENDIF",
+    "",
+    '$IF %stage% == "exogenous_values":',
+    f"  $GROUP G_m{module}_data",
+    f"    G_m{module}_values_endo, -{variable('v', module, 2)}",
+    f"    G_m{module}_exogenous_forecast$(t.val > 2015)",
+    "  ;",
+    f'  @load(G_m{module}_data, "Gdx\\data.gdx")',
+    f"  $LOOP G_m{module}_prices_endo:",
+    "    {name}.l{sets}$({conditions} and {name}.l{sets} = 0) = 1;",
+    "  $ENDLOOP",
+    f"  @growth_adjust_group(G_m{module}_quantities_endo)",
+    "$ENDIF",
+    "",
+    '$IF %stage% == "static_calibration":',
+    f"  $GROUP G_m{module}_static_calibration",
+    f"    G_m{module}_endo",
+    f"    uM{module}x0[t], -{variable('p', module, 0)}[t]",
+    "  ;",
+    f"  $BLOCK B_m{module}_static",
+    f"    $LOOP B_m{module}:",
+    "      {name}_static{sets}$({conditions}).. {LHS} =E= {RHS};",
+    "    $ENDLOOP",
+    "  $ENDBLOCK",
+    f"  $FIX G_m{module}_exogenous_forecast;",
+    f"  $UNFIX G_m{module}_static_calibration;",
+    "$ENDIF",
+    "",
+  ]
+  return "\n".join(lines)
+
+
+def settings_source(n_modules):
+  """Return source defining the functions used by the synthetic modules"""
+  lines = [
+    "# " + "=" * 118,
+    "# Settings and functions",
+    "# " + "=" * 118,
+    "$SETGLOBAL terminal_year 2099",
+    "$SETGLOBAL homotopy 1",
+    "",
+    "$FUNCTION import_from_modules(stage_key):",
+    "  $SETGLOBAL stage stage_key;",
+    *[f"  $IMPORT module_{module}.gms;" for module in range(n_modules)],
+    "$ENDFUNCTION",
+    "",
+    "$FUNCTION load({group}, {gdx}):",
+    "  $LOOP {group}:",
+    "    {name}.l{sets}$({conditions}) = @gdx_value({name}, {gdx});",
+    "  $ENDLOOP",
+    "$ENDFUNCTION",
+    "",
+    "$FUNCTION gdx_value({name}, {gdx}):",
+    "  {name}_loaded",
+    "$ENDFUNCTION",
+    "",
+    "$FUNCTION growth_adjust_group({group}):",
+    "  $offlisting",
+    "  $LOOP {group}:",
+    "      {name}.l{sets}$({conditions}) = {name}.l{sets} * growth_factor[t];",
+    "  $ENDLOOP",
+    "  $onlisting",
+    "$ENDFUNCTION",
+    "",
+    "$FUNCTION save({group}):",
+    "  $LOOP {group}:",
+    "    {name}_saved{sets}$({conditions}) = {name}.l{sets};",
+    "  $ENDLOOP",
+    "$ENDFUNCTION",
+    "",
+    "$FUNCTION load_linear_combination({group}, {share}):",
+    "  $LOOP {group}:",
+    "    {name}.l{sets}$({conditions}) = {share} * {name}_saved{sets} + (1-{share}) * {name}.l{sets};",
+    "  $ENDLOOP",
+    "$ENDFUNCTION",
+    "",
+  ]
+  return "\n".join(lines)
+
+
+def main_source(n_modules):
+  """Return source of the main file, importing the modules stage by stage"""
+  modules = range(n_modules)
+  lines = [
+    "# " + "=" * 118,
+    "# Synthetic gamY model",
+    "# " + "=" * 118,
+    "$IMPORT settings.gms",
+    "",
+    '@import_from_modules("variables")',
+    "$GROUP G_endo",
+    *[f"  G_m{module}_endo" for module in modules],
+    ";",
+  ]
+  for _, kind in PREFIXES:
+    lines += [f"$GROUP G_{kind}", *[f"  G_m{module}_{kind}_endo" for module in modules], ";"]
+  lines += [
+    "",
+    '@import_from_modules("equations")',
+    "$MODEL M_base",
+    *[f"  B_m{module}" for module in modules],
+    ";",
+    "",
+    '@import_from_modules("exogenous_values")',
+    "$LOOP G_values:",
+    "  {name}.lo{sets}$({conditions}) = -inf;",
+    "$ENDLOOP",
+    "",
+    '@import_from_modules("static_calibration")',
+    "$GROUP G_static_calibration",
+    *[f"  G_m{module}_static_calibration" for module in modules],
+    ";",
+    "$MODEL M_static_calibration",
+    *[f"  B_m{module}_static" for module in modules],
+    ";",
+    "$FIX All; $UNFIX G_static_calibration;",
+    "$SOLVE M_static_calibration;",
+    "",
+    "$GROUP G_load All, -G_static_calibration;",
+    "@save(G_load)",
+    "$FOR {share_of_previous} in [1, 0.75, 0.5, 0.25]:",
+    "  $IF %homotopy% == 1:",
+    "    @load_linear_combination(G_load, {share_of_previous})",
+    "    $FIX All; $UNFIX G_static_calibration;",
+    "    $SOLVE M_static_calibration;",
+    "  $ENDIF",
+    "$ENDFOR",
+    "",
+    f"$FOR {{module}} in range({n_modules}):",
+    "  $DISPLAY G_m{module}_endo;",
+    "$ENDFOR",
+    "",
+  ]
+  return "\n".join(lines)
+
+
+def generate_model(n_modules, n_variables):
+  """Return dict of file names and sources of a synthetic model"""
+  files = {"main.gms": main_source(n_modules), "settings.gms": settings_source(n_modules)}
+  for module in range(n_modules):
+    files[f"module_{module}.gms"] = module_source(module, n_variables)
+  return files
+
+
+def write_model(directory, n_modules, n_variables):
+  """Write synthetic model to directory and return the path of the main file"""
+  for file_name, source in generate_model(n_modules, n_variables).items():
+    with open(os.path.join(directory, file_name), "w") as f:
+      f.write(source)
+  return os.path.join(directory, "main.gms")
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark of the case-insensitive mappings used for symbol tables (groups, blocks, and the "all" group),
+comparing CaseInsensitiveDict with FoldedDict (and RecencyDict, used for the "all" group) on a MAKRO sized table.
+Keys are looked up both with the case they were defined with, as in most of the model, and in lowercase.
+"""
+import timeit
+
+from classes import CaseInsensitiveDict, FoldedDict, RecencyDict
+
+MAPPINGS = {"CaseInsensitiveDict": CaseInsensitiveDict, "FoldedDict": FoldedDict, "RecencyDict": RecencyDict}
+
+
+def symbol_names(n_symbols):
+  """Return n_symbols variable names in the style of MAKRO, e.g. vHhx15 or qProd_s7"""
+  prefixes = ("v", "q", "p", "r", "j", "u", "s", "n")
+  stems = ("Hhx", "Prod", "C", "Y", "M", "X", "I", "L", "K", "W", "Tax", "Sub")
+  return [f"{prefixes[i % len(prefixes)]}{stems[i // len(prefixes) % len(stems)]}{'_s' if i % 3 else ''}{i}"
+          for i in range(n_symbols)]
+
+
+def benchmark_mapping(cls, names, repeat):
+  """Return dict of the best time per operation, in seconds, of each operation on a mapping of class cls"""
+  lower_names = [name.lower() for name in names]
+  missing_names = [name + "_missing" for name in names]
+  mapping = cls((name, i) for i, name in enumerate(names))
+  other = cls(mapping.items())
+  operations = {
+    "build": lambda: cls((name, i) for i, name in enumerate(names)),
+    "set": lambda: [mapping.__setitem__(name, 0) for name in names],
+    "lookup": lambda: [mapping[name] for name in names],
+    "lookup (lowercase)": lambda: [mapping[name] for name in lower_names],
+    "contains": lambda: [name in mapping for name in names],
+    "contains (missing)": lambda: [name in mapping for name in missing_names],
+    "get": lambda: [mapping.get(name) for name in names],
+    "values": lambda: [value for value in mapping.values()],
+    "items": lambda: [item for item in mapping.items()],
+    "copy": lambda: mapping.copy(),
+    "equal": lambda: mapping == other,
+  }
+  return {
+    operation: min(timeit.repeat(func, number=1, repeat=repeat)) / len(names)
+    for operation, func in operations.items()
+  }
+
+
+def run_mapping_benchmark(n_symbols=5000, repeat=20):
+  names = symbol_names(n_symbols)
+  return {
+    "symbols": n_symbols,
+    "repeat": repeat,
+    "times": {name: benchmark_mapping(cls, names, repeat) for name, cls in MAPPINGS.items()},
+  }
+
+
+def mapping_report(results):
+  """Return text report of the time per key of each operation and the speedup relative to CaseInsensitiveDict"""
+  times = results["times"]
+  baseline = times["CaseInsensitiveDict"]
+  width = max(len(operation) for operation in baseline) + 8
+  lines = [
+    f"gamY mapping benchmark, {results['symbols']} symbols, best of {results['repeat']}",
+    "",
+    f"{'Operation [ns per key]':<{width}}" + "".join(f"{name:>22}" for name in times),
+    "-" * (width + 22 * len(times)),
+  ]
+  for operation, base_time in baseline.items():
+    lines.append(
+      f"{operation:<{width}}"
+      + "".join(f"{t[operation] * 1e9:>13.1f} ({base_time / t[operation]:>4.1f}x)" for t in times.values())
+    )
+  return "\n".join(lines) + "\n"
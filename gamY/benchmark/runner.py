@@ -0,0 +1,131 @@
+"""
+Runner of the gamY benchmark suite.
+For each scale (number of synthetic model modules) a model is generated in a temporary folder and the following is timed:
+  Precompiler.__call__ (the full expansion of the model),
+  Precompiler.save and Precompiler.read of the resulting groups, blocks, and functions,
+  and the self time of each command handler (e.g. group or loop), measured using the profiler.
+The scaling exponent of each measurement is the slope of a least squares fit of log(time) on log(source size).
+An exponent close to 1 means linear scaling, while an exponent close to 2 indicates quadratic behaviour.
+"""
+import contextlib
+import io
+import json
+import math
+import os
+import tempfile
+from timeit import default_timer as timer
+
+from gamY import Precompiler
+from profiler import Profiler
+
+from .generator import write_model
+
+SUPER_LINEAR_THRESHOLD = 1.2  # Scaling exponents above this threshold are flagged in the report
+
+
+def best_time(func, repeat):
+  """Return the best wall time of repeat calls to func"""
+  times = []
+  for _ in range(repeat):
+    start_time = timer()
+    func()
+    times.append(timer() - start_time)
+  return min(times)
+
+
+def benchmark_scale(directory, n_modules, n_variables, engine, repeat):
+  """Generate a model with n_modules modules in directory and return dict of measurements"""
+  main_file = write_model(directory, n_modules, n_variables)
+  source_bytes = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory) if f.endswith(".gms"))
+
+  def expand():
+    precompiler = Precompiler(main_file, engine=engine)
+    precompiler()
+    return precompiler
+
+  with contextlib.redirect_stdout(io.StringIO()):  # Silence warnings and read messages from the precompiler
+    precompiler = expand()
+    results = {"__call__": best_time(expand, repeat)}
+    results["save"] = best_time(lambda: precompiler.save("benchmark"), repeat)
+    results["read"] = best_time(lambda: Precompiler(main_file).read("benchmark"), repeat)
+
+    profiled = Precompiler(main_file, engine=engine)
+    profiled.profiler = Profiler(profiled.file_name, trace_memory=False)
+    profiled()
+  for command, entry in profiled.profiler.stats["commands"].items():
+    results[command] = entry["self_time"]
+
+  return {
+    "modules": n_modules,
+    "source_bytes": source_bytes,
+    "savepoint_bytes": os.path.getsize(os.path.join(directory, "benchmark.pkl")),
+    "times": results,
+  }
+
+
+def scaling_exponent(sizes, times):
+  """Return slope of least squares fit of log(time) on log(size), ignoring measurements of zero"""
+  points = [(math.log(s), math.log(t)) for s, t in zip(sizes, times) if s > 0 and t > 0]
+  if len(points) < 2:
+    return None
+  mean_x = sum(x for x, _ in points) / len(points)
+  mean_y = sum(y for _, y in points) / len(points)
+  variance = sum((x - mean_x) ** 2 for x, _ in points)
+  if variance == 0:
+    return None
+  return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def run_benchmark(scales=(1, 2, 4, 8), n_variables=30, engine="regex", repeat=3):
+  """Run benchmark at each scale and return dict of results, including the scaling exponent of each measurement"""
+  runs = []
+  for n_modules in scales:
+    with tempfile.TemporaryDirectory() as directory:
+      runs.append(benchmark_scale(directory, n_modules, n_variables, engine, repeat))
+
+  sizes = [run["source_bytes"] for run in runs]
+  measurements = list(runs[0]["times"])
+  for run in runs[1:]:
+    measurements += [m for m in run["times"] if m not in measurements]
+  exponents = {m: scaling_exponent(sizes, [run["times"].get(m, 0) for run in runs]) for m in measurements}
+  return {
+    "engine": engine,
+    "variables_per_module": n_variables,
+    "repeat": repeat,
+    "runs": runs,
+    "exponents": exponents,
+  }
+
+
+def report(results):
+  """Return text report with a scaling curve for each measurement"""
+  runs = results["runs"]
+  exponents = results["exponents"]
+  width = max(len(m) for m in exponents) + 8
+  lines = [
+    f"gamY benchmark, engine: {results['engine']}, "
+    f"{results['variables_per_module']} variables per module, best of {results['repeat']}",
+    "",
+    f"{'Modules':<{width}}" + "".join(f"{run['modules']:>10}" for run in runs) + f"{'Exponent':>10}",
+    "-" * (width + 10 * (len(runs) + 1)),
+    f"{'Source [kB]':<{width}}" + "".join(f"{run['source_bytes'] / 1e3:>10.1f}" for run in runs),
+    f"{'Savepoint [kB]':<{width}}" + "".join(f"{run['savepoint_bytes'] / 1e3:>10.1f}" for run in runs),
+  ]
+  # Totals first, followed by the handlers sorted by time at the largest scale
+  totals = ["__call__", "save", "read"]
+  handlers = sorted((m for m in exponents if m not in totals), key=lambda m: runs[-1]["times"].get(m, 0), reverse=True)
+  for measurement in totals + handlers:
+    exponent = exponents[measurement]
+    flag = " *" if exponent is not None and exponent > SUPER_LINEAR_THRESHOLD else ""
+    lines.append(
+      f"{measurement + ' [ms]':<{width}}"
+      + "".join(f"{run['times'].get(measurement, 0) * 1e3:>10.1f}" for run in runs)
+      + (f"{exponent:>10.2f}" if exponent is not None else f"{'':>10}") + flag
+    )
+  lines += ["", f"* Super-linear scaling (exponent above {SUPER_LINEAR_THRESHOLD}) with respect to the source size"]
+  return "\n".join(lines) + "\n"
+
+
+def save_results(results, path):
+  with open(path, "w") as f:
+    json.dump(results, f, indent=2)
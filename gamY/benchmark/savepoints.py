@@ -0,0 +1,59 @@
+"""
+Measurement of the savepoints in a folder, e.g. Model/Savepoints after running the model stages.
+For each savepoint the following is reported:
+  the size of the file,
+  the time to read the file and its index (the entries are unpickled lazily, see savepoint.py),
+  the time to read the file and unpickle all groups, conditions, blocks, and functions,
+  and the time to save all of them again as a full savepoint.
+"""
+import os
+import tempfile
+import timeit
+
+import savepoint
+
+
+def load_all(path):
+  sections, global_variables, _ = savepoint.read(path)
+  for mapping in sections.values():
+    for value in mapping.values():
+      if hasattr(value, "values"):
+        list(value.values())
+  return sections, global_variables
+
+
+def measure_savepoint(path, repeat):
+  """Return dict of the size of a savepoint file, and the best times to read, load, and save it"""
+  sections, global_variables = load_all(path)
+  with tempfile.TemporaryDirectory() as directory:
+    save_path = os.path.join(directory, "savepoint.pkl")
+    save_time = min(timeit.repeat(lambda: savepoint.save(save_path, sections, global_variables), number=1, repeat=repeat))
+  return {
+    "bytes": os.path.getsize(path),
+    "read": min(timeit.repeat(lambda: savepoint.read(path), number=1, repeat=repeat)),
+    "load_all": min(timeit.repeat(lambda: load_all(path), number=1, repeat=repeat)),
+    "save": save_time,
+  }
+
+
+def measure_savepoints(directory, repeat=5):
+  """Return dict of measurements of each savepoint (.pkl file) in directory"""
+  return {
+    file_name[:-4]: measure_savepoint(os.path.join(directory, file_name), repeat)
+    for file_name in sorted(os.listdir(directory)) if file_name.endswith(".pkl")
+  }
+
+
+def savepoints_report(results):
+  width = max([len("Savepoint")] + [len(name) for name in results]) + 2
+  lines = [
+    f"{'Savepoint':<{width}}{'Size [kB]':>12}{'Read [ms]':>12}{'Load all [ms]':>15}{'Save [ms]':>12}",
+    "-" * (width + 51),
+  ]
+  for name, result in list(results.items()) + [("Total", {k: sum(r[k] for r in results.values()) for k in
+                                                           ("bytes", "read", "load_all", "save")})]:
+    lines.append(
+      f"{name:<{width}}{result['bytes'] / 1e3:>12.1f}{result['read'] * 1e3:>12.2f}"
+      f"{result['load_all'] * 1e3:>15.2f}{result['save'] * 1e3:>12.2f}"
+    )
+  return "\n".join(lines) + "\n"
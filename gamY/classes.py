@@ -1,4 +1,6 @@
-from collections.abc import MutableMapping, Mapping
+import itertools
+import sys
+from collections.abc import MutableMapping, Mapping, KeysView, ValuesView, ItemsView
 
 class CaseInsensitiveDict(MutableMapping):
 
@@ -70,49 +72,304 @@ class CaseInsensitiveDict(MutableMapping):
         return str(dict(self.items()))
 
 
-class Group(CaseInsensitiveDict):
+class TextBuffer:
+    """Segment list (rope) used to build large texts.
+    Appending costs time proportional to the text appended, rather than to the text already in the buffer,
+    and the segments are only joined once, when the buffer is converted to a string::
+        buffer = TextBuffer("a")
+        buffer += "b"
+        str(buffer) == "ab"  # True
+    """
+    __slots__ = ("segments", "length")
+
+    def __init__(self, text=""):
+        self.segments = []
+        self.length = 0
+        self.append(text)
+
+    def append(self, text):
+        if isinstance(text, TextBuffer):
+            self.segments.extend(text.segments)
+            self.length += text.length
+        elif text:
+            self.segments.append(text)
+            self.length += len(text)
+        return self
+
+    __iadd__ = append
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        text = "".join(self.segments)
+        self.segments = [text] if text else []
+        return text
+
+
+_dict_getitem = dict.__getitem__
+_dict_setitem = dict.__setitem__
+
+
+class FoldedDict(dict):
+    """A case-insensitive ``dict``, replacing CaseInsensitiveDict where lookups are frequent.
+    Items are stored in the underlying dict under the case of the key they were first set with,
+    along with an index of the lowercase (folded) keys.
+    Looking a key up with the case it was set with, iterating, ``keys()``, ``values()``, and ``items()``
+    are therefore done by the dict itself, without calling Python code or copying.
+    Looking a key up with another case falls back to the index of folded keys (see ``__missing__``)::
+        fd = FoldedDict()
+        fd['Accept'] = 'application/json'
+        fd['aCCEPT'] == 'application/json'  # True
+        list(fd) == ['Accept']  # True
+    Unlike CaseInsensitiveDict, setting an existing key with another case keeps the stored case::
+        fd['accept'] = 'text/plain'
+        list(fd) == ['Accept']  # True
+    Otherwise FoldedDict behaves as CaseInsensitiveDict, including the comparison of keys regardless of case.
+    """
+    __slots__ = ("_folded",)
+
+    def __init__(self, data=None, **kwargs):
+        super().__init__()
+        self._folded = {}  # Maps lowercase keys to the keys stored
+        self.update(data, **kwargs)
+
+    def __missing__(self, key):
+        return _dict_getitem(self, self._folded[key.lower()])
+
+    def __setitem__(self, key, value):
+        # Setting an existing key with another case keeps the case it was first set with
+        _dict_setitem(self, self._folded.setdefault(key.lower(), key), value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, self._folded.pop(key.lower()))
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key.lower() in self._folded
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        del self._folded[key.lower()]
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, data=None, **kwargs):
+        if data is not None:
+            for key, value in (data.items() if isinstance(data, Mapping) else data):
+                self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def clear(self):
+        dict.clear(self)
+        self._folded.clear()
+
+    def lower_items(self):
+        """Like iteritems(), but with all lowercase keys."""
+        return ((key.lower(), value) for key, value in self.items())
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        # Compare insensitively
+        return dict(self.lower_items()) == dict((key.lower(), value) for key, value in other.items())
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def copy(self):
+        new = type(self)()
+        dict.update(new, self)
+        new._folded = self._folded.copy()
+        return new
+
+    def __reduce__(self):
+        return type(self), (list(self.items()),)
+
+    def __setstate__(self, state):
+        # Groups and blocks pickled by earlier versions of gamY, as CaseInsensitiveDicts, store their items in _store
+        self._folded = {}
+        for key, value in state.get("_store", {}).values():
+            self[key] = value
+
+
+class Group(FoldedDict):
     pass
 
 
-class Block(CaseInsensitiveDict):
+class RecencyDict(FoldedDict):
+    """Case-insensitive dict where merging another mapping moves its keys to the front.
+    Used for the "all" group (and its conditions), which lists the most recently grouped variables first.
+    ``merge(other)`` gives the same result as ``CaseInsensitiveDict(other, **self)``,
+    i.e. the keys of other first, followed by the remaining keys, with the values and keys of self taking precedence,
+    but takes time proportional to the size of other rather than rebuilding the dict::
+        rd = RecencyDict({"a": 1, "b": 2})
+        rd.merge({"B": 3, "c": 4})
+        list(rd.items()) == [("b", 2), ("c", 4), ("a", 1)]  # True
+    Lookups are done by the underlying FoldedDict, while the order is kept separately:
+    the lowercase keys merged are stored in reverse order in ``_front``, other keys in order in ``_back``.
+    """
+    __slots__ = ("_front", "_back")
+
+    def __init__(self, data=None, **kwargs):
+        self._front = {}
+        self._back = {}
+        super().__init__(data, **kwargs)
+
+    def merge(self, other):
+        for key in reversed(list(other)):
+            lower = key.lower()
+            if lower in self._front:
+                del self._front[lower]
+            elif lower in self._back:
+                del self._back[lower]
+            else:
+                dict.__setitem__(self, key, other[key])
+                self._folded[lower] = key
+            self._front[lower] = None
+
+    def __setitem__(self, key, value):
+        lower = key.lower()
+        casedkey = self._folded.get(lower)
+        if casedkey is None:
+            self._back[lower] = None
+        elif casedkey != key:
+            dict.__delitem__(self, casedkey)  # The order is not kept by the underlying dict
+        dict.__setitem__(self, key, value)
+        self._folded[lower] = key
+
+    def __delitem__(self, key):
+        lower = key.lower()
+        FoldedDict.__delitem__(self, key)
+        if lower in self._front:
+            del self._front[lower]
+        else:
+            del self._back[lower]
+
+    def __iter__(self):
+        folded = self._folded
+        return (folded[lower] for lower in itertools.chain(reversed(self._front), self._back))
+
+    def keys(self):
+        return KeysView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def starts_with(self, keys):
+        """Return True if keys are the first keys in order, i.e. if merging keys would not change the order"""
+        if len(keys) > len(self):
+            return False
+        order = itertools.chain(reversed(self._front), self._back)
+        return all(key.lower() == lower for key, lower in zip(keys, order))
+
+    def popitem(self):
+        key = next(iter(self))
+        return key, self.pop(key)
+
+    def clear(self):
+        FoldedDict.clear(self)
+        self._front.clear()
+        self._back.clear()
+
+    def copy(self):
+        return RecencyDict(self.items())
+
+    def __repr__(self):
+        return str(dict(self.items()))
+
+
+class Block(FoldedDict):
     pass
 
 
 class Variable:
-    """Data container for variables"""
+    """Data container for variables
+    Names, sets, and labels are interned, as the same sets (e.g. "[a_,t]") are shared by many variables.
+    Variables are pickled as the arguments to create them, rather than as a dict of attributes.
+    """
+    __slots__ = ("name", "sets", "label")
 
     def __init__(self, name="", sets="", label=""):
-        if not name:
-            name = ""
-        if not sets:
-            sets = ""
-        if not label:
-            label = ""
-        self.name = name
-        self.sets = sets
-        self.label = label
+        self.name = sys.intern(name or "")
+        self.sets = sys.intern(sets or "")
+        self.label = sys.intern(label or "")
+
+    def __reduce__(self):
+        return Variable, (self.name, self.sets, self.label)
+
+    def __setstate__(self, state):
+        # Variables pickled by earlier versions of gamY store their attributes in a dict
+        for key in self.__slots__:
+            setattr(self, key, state[key])
 
 
 class Equation:
-    """Data container for equations"""
+    """Data container for equations, pickled as the arguments to create them"""
+    __slots__ = ("name", "sets", "conditions", "LHS", "RHS")
 
     def __init__(self, name="", sets="", conditions="", LHS="", RHS=""):
-        self.name = name
-        self.sets = sets.lower()
-        self.conditions = conditions.lower()
+        self.name = sys.intern(name)
+        self.sets = sys.intern(sets.lower())
+        self.conditions = sys.intern(conditions.lower())
         self.LHS = LHS
         self.RHS = RHS
 
-        self._name = name[1:]  #  Name without E, usefull as slicing is not usable in python string format method
+    @property
+    def _name(self):
+        """Name without E, usefull as slicing is not usable in python string format method"""
+        return self.name[1:]
+
+    def __reduce__(self):
+        return Equation, (self.name, self.sets, self.conditions, self.LHS, self.RHS)
+
+    def __setstate__(self, state):
+        # Equations pickled by earlier versions of gamY store their attributes (and _name) in a dict
+        for key in self.__slots__:
+            setattr(self, key, state[key])
 
 
 class Function:
-    """Data container for user defined functions"""
+    """Data container for user defined functions, pickled as the arguments to create them"""
+    __slots__ = ("name", "args", "expression")
+
     def __init__(self, name, args, expression):
-        self.name = name.lower()
+        self.name = sys.intern(name.lower())
         self.args = [arg.strip() for arg in args.split(",")]
         self.expression = expression
 
+    def __reduce__(self):
+        return Function, (self.name, ",".join(self.args), self.expression)
+
+    def __setstate__(self, state):
+        # Functions pickled by earlier versions of gamY store their attributes in a dict
+        for key in self.__slots__:
+            setattr(self, key, state[key])
+
 
 class MockMatch:
     def __init__(self, *groups):
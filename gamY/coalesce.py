@@ -0,0 +1,106 @@
+"""
+Coalescing of consecutive $FIX and $UNFIX commands, used by the token engine with the --coalesce_fix option.
+Sequences such as '$FIX All; $UNFIX G_endo; $UNFIX vtLukning$(...);' fix every variable and then reset the bounds of most of them.
+Commands separated only by whitespace and comments form a run, which is expanded as a whole (see Precompiler.fix_unfix_run),
+emitting only the net bound operations of each variable:
+  an operation is restricted to the elements which are not covered by a later operation on the same variable,
+  e.g. '$FIX All; $UNFIX G_endo;' fixes only the variables of All that are not in G_endo (or are outside its conditions),
+  and an operation which is covered entirely is dropped.
+A $FIX with a value, e.g. $FIX(0), also sets the level of the variable, so it is kept unrestricted by later operations.
+The operations of a variable are kept as they are if they use different sets, e.g. qG[gTot,t] and qG[g,t],
+or if a condition refers to the level or bounds of a variable, which the operations themselves change.
+The commands are still processed in order, so the groups and conditions they read are the same as without coalescing.
+"""
+import re
+
+from conditions import combine
+
+#  Text between commands of a run: whitespace, '#' comments, and '*' comments in the first column
+SEPARATOR_PATTERN = re.compile(r"[ \t]*(?:#[^\n]*)?(?:\n(?:\*[^\n]*|[ \t]*(?:#[^\n]*)?))*")
+
+#  Attributes of variables changed by the operations, e.g. 'x.l[t] > 0'
+ATTRIBUTE_PATTERN = re.compile(r"\.(?:l|lo|up|fx|m|scale|prior)\b", re.IGNORECASE)
+
+
+class FixRun:
+  """Node of consecutive $FIX and $UNFIX commands in the command tree, expanded together"""
+  __slots__ = ("commands",)
+  kind = "fix_run"
+
+  def __init__(self, commands):
+    self.commands = commands
+
+  @property
+  def text(self):
+    return "".join(command.text for command in self.commands)
+
+
+class BoundOperation:
+  """Assignments to the bounds of a variable by a $FIX or $UNFIX command, e.g. [("lo", "-inf"), ("up", "inf")]"""
+  __slots__ = ("variable", "conditions", "assignments", "sets_level")
+
+  def __init__(self, variable, conditions, assignments, sets_level=False):
+    self.variable = variable
+    self.conditions = conditions  # Condition of the elements, as in the conditions of a group, e.g. '(tx0[t])'
+    self.assignments = assignments
+    self.sets_level = sets_level  # True for a $FIX with a value, which also sets the level of the variable
+
+  def text(self, conditions):
+    """Return GAMS assignments of the operation, limited to conditions"""
+    name, sets = self.variable.name, self.variable.sets
+    conditions = "$" + conditions if conditions else ""
+    return "".join(f"{name}.{attribute}{sets}{conditions} = {value};\n" for attribute, value in self.assignments)
+
+
+def find_runs(nodes):
+  """Return list of nodes with runs of two or more $FIX and $UNFIX commands replaced by a FixRun node"""
+  result, run, separators = [], [], []
+  for node in nodes:
+    if isinstance(node, str):
+      if run and SEPARATOR_PATTERN.fullmatch(node):
+        separators.append(node)  # Emitted before the run, or after the last command if the run ends
+        continue
+    elif node.kind == "fix":
+      if run:
+        result += separators
+        separators = []
+      run.append(node)
+      continue
+    end_run(result, run, separators)
+    run, separators = [], []
+    result.append(node)
+  end_run(result, run, separators)
+  return result
+
+
+def end_run(result, run, separators):
+  if len(run) > 1:
+    result.append(FixRun(run))
+  else:
+    result += run
+  result += separators
+
+
+def net_operations(operations):
+  """Return list of (operation, conditions) with the operations of a run grouped by variable, limited to their net effect"""
+  by_variable = {}
+  for operation in operations:
+    by_variable.setdefault(operation.variable.name.lower(), []).append(operation)
+  net = []
+  for variable_operations in by_variable.values():
+    sets = {operation.variable.sets.replace(" ", "").lower() for operation in variable_operations}
+    if len(sets) > 1 or any(ATTRIBUTE_PATTERN.search(operation.conditions) for operation in variable_operations):
+      net += [(operation, operation.conditions) for operation in variable_operations]
+      continue
+    for i, operation in enumerate(variable_operations):
+      conditions = operation.conditions
+      later = variable_operations[i + 1:]
+      if later and not operation.sets_level:
+        covered = combine(tuple(other.conditions for other in later), intersect=False)
+        if not covered:
+          continue  # Covered entirely by later operations
+        conditions = combine((conditions, "not " + covered))
+        if conditions == "(0)":
+          continue
+      net.append((operation, conditions))
+  return net
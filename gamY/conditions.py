@@ -0,0 +1,237 @@
+"""
+Boolean algebra of the dollar conditions of groups, used by Precompiler.combine_conditions.
+A condition is parsed into an expression tree of and, or, and not over atoms,
+where an atom is any other expression, e.g. 'tx0[t]' or 't.val > 2015', which is compared by its text.
+The tree is simplified as it is built, and written back in a minimal form:
+  nested operations are flattened and repeated operands removed, e.g. '((a) and ((a) and (b)))' becomes '(a and b)',
+  absorption, e.g. '(a and (a or b))' becomes '(a)',
+  complements, e.g. '(a and not a)' becomes '(0)',
+  double negation, e.g. 'not (not a)' becomes 'a',
+  and constants, e.g. '(a or 0)' becomes '(a)', while a condition which is always true is removed.
+Only the truth value of a condition is preserved, which is all that matters when it is used as a dollar condition.
+Parts using xor, eqv, or imp are kept as atoms.
+"""
+import re
+from functools import lru_cache
+
+ATOM, NOT, AND, OR = "atom", "not", "and", "or"
+TRUE = ("true",)
+FALSE = ("false",)
+
+#  Quoted strings, opening brackets, closing brackets, and logical operators
+TOKEN_PATTERN = re.compile(r"""('[^']*'|"[^"]*")|([(\[{])|([)\]}])|\b(and|or|not|xor|eqv|imp)\b""", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?", re.IGNORECASE)
+#  Atoms which can be negated without parentheses, e.g. 'tx0[t]' or 'sameas(s,t)'
+SIMPLE_ATOM_PATTERN = re.compile(r"[\w.]+(?:[(\[][^()\[\]]*[)\]])?")
+BRACKETS = {"(": ")", "[": "]", "{": "}"}
+
+
+def split(text):
+  """Return list of operands and the logical operators between them, splitting only outside of brackets and quotes"""
+  tokens, depth, start = [], 0, 0
+  for match in TOKEN_PATTERN.finditer(text):
+    quote, opening, closing, operator = match.groups()
+    if opening:
+      depth += 1
+    elif closing:
+      depth -= 1
+    elif operator and depth == 0:
+      tokens += [text[start:match.start()], operator.lower()]
+      start = match.end()
+  tokens.append(text[start:])
+  return tokens
+
+
+def is_enclosed(text):
+  """
+  Return True if the first bracket of text is closed by its last character, e.g. '(a and b)' but not '(a) and (b)'
+
+  >>> is_enclosed('(foo[t])')
+  True
+  >>> is_enclosed('(foo)(bar)')
+  False
+  """
+  if len(text) < 2 or BRACKETS.get(text[0]) != text[-1]:
+    return False
+  depth = 0
+  for match in TOKEN_PATTERN.finditer(text, 0, len(text) - 1):
+    if match.group(2):
+      depth += 1
+    elif match.group(3):
+      depth -= 1
+      if depth == 0:
+        return False
+  return depth == 1
+
+
+def atom(text):
+  if NUMBER_PATTERN.fullmatch(text):
+    return FALSE if float(text) == 0 else TRUE
+  if text.lower() in ("yes", "no"):
+    return TRUE if text.lower() == "yes" else FALSE
+  if len(split(text)) > 1 and not is_enclosed(text):
+    text = f"({text})"  # Keep xor, eqv, and imp together
+  return ATOM, text
+
+
+def negation(operand):
+  if operand is TRUE:
+    return FALSE
+  if operand is FALSE:
+    return TRUE
+  if operand[0] == NOT:
+    return operand[1]
+  return NOT, operand
+
+
+def is_complement(term, kind, dual, seen):
+  """
+  Return True if the negation of term is implied by the operands seen in a junction of kind, e.g. 'not (a or b)' in 'a or b or not (a or b)',
+  where (a or b) is flattened into the operands a and b, or '(a or b)' in 'not a and not b and (a or b)'
+  """
+  complement = negation(term)
+  if complement in seen:
+    return True
+  if complement[0] == kind:
+    return all(operand in seen for operand in complement[1])
+  if term[0] == dual:
+    return all(negation(operand) in seen for operand in term[1])
+  return False
+
+
+def junction(kind, operands):
+  """Return simplified conjunction (kind AND) or disjunction (kind OR) of operands, which are already simplified"""
+  identity, absorbing = (TRUE, FALSE) if kind == AND else (FALSE, TRUE)
+  terms, seen = [], set()
+  for operand in operands:
+    for term in (operand[1] if operand[0] == kind else (operand,)):
+      if term is absorbing:
+        return absorbing
+      if term is not identity and term not in seen:
+        terms.append(term)
+        seen.add(term)
+  dual = OR if kind == AND else AND
+  if any(is_complement(term, kind, dual, seen) for term in terms):
+    return absorbing
+
+  # Absorption, e.g. (a and (a or b)) is a, as the operands of (a or b) include all the operands of a
+  subterms = [frozenset(term[1]) if term[0] == dual else frozenset((term,)) for term in terms]
+  terms = [term for term, own in zip(terms, subterms) if not any(other < own for other in subterms)]
+
+  if not terms:
+    return identity
+  if len(terms) == 1:
+    return terms[0]
+  return kind, tuple(terms)
+
+
+@lru_cache(maxsize=None)
+def parse(text):
+  """Return simplified expression tree of a condition, or an atom of the whole text if it is not understood"""
+  text = text.strip()
+  if is_enclosed(text):
+    return parse(text[1:-1])
+  tokens = []
+  for i, token in enumerate(split(text)):
+    if i % 2:
+      tokens.append(token)
+    elif token.strip():
+      tokens.append((ATOM, token.strip()))
+  try:
+    tree, position = parse_or(tokens, 0)
+    if position != len(tokens):
+      raise ValueError(text)
+  except (ValueError, IndexError):
+    return atom(text)
+  return tree
+
+
+def parse_or(tokens, position):
+  operands = []
+  operand, position = parse_and(tokens, position)
+  operands.append(operand)
+  while position < len(tokens) and tokens[position] == OR:
+    operand, position = parse_and(tokens, position + 1)
+    operands.append(operand)
+  return junction(OR, operands), position
+
+
+def parse_and(tokens, position):
+  operands = []
+  operand, position = parse_not(tokens, position)
+  operands.append(operand)
+  while position < len(tokens) and tokens[position] == AND:
+    operand, position = parse_not(tokens, position + 1)
+    operands.append(operand)
+  return junction(AND, operands), position
+
+
+def parse_not(tokens, position):
+  token = tokens[position]
+  if token == NOT:
+    operand, position = parse_not(tokens, position + 1)
+    return negation(operand), position
+  if type(token) is not tuple:
+    raise ValueError(token)  # Operator where an operand is expected, e.g. xor
+  text = token[1]
+  return (parse(text) if is_enclosed(text) else atom(text)), position + 1
+
+
+def write(tree):
+  """Return text of expression tree, with parentheses only around operations nested in other operations"""
+  if tree is TRUE:
+    return "1"
+  if tree is FALSE:
+    return "0"
+  kind, operand = tree
+  if kind == ATOM:
+    return operand
+  if kind == NOT:
+    text = write(operand)
+    if operand[0] == ATOM and (SIMPLE_ATOM_PATTERN.fullmatch(text) or is_enclosed(text)):
+      return "not " + text
+    return f"not ({text})"
+  return f" {kind} ".join(f"({write(term)})" if term[0] in (AND, OR) else write(term) for term in operand)
+
+
+@lru_cache(maxsize=None)
+def combine(conditions, intersect=True):
+  """
+  Return the conjunction (or disjunction if intersect is False) of a tuple of conditions, enclosed in parentheses.
+  Empty conditions are ignored in a conjunction, while an empty condition makes a disjunction empty.
+  A leading dollar sign of a condition is ignored.
+
+  >>> combine(("$(tx0[t])", "(d1qY[s_,t] and tx0[t])"))
+  '(tx0[t] and d1qY[s_,t])'
+  >>> combine(("(tx0[t])", ""), intersect=False)
+  ''
+  >>> combine(("not t.val > 2015", "d1qY[s_,t]"))
+  '(not (t.val > 2015) and d1qY[s_,t])'
+  >>> combine(("(a xor b)", "a eqv not b", "a"))
+  '((a xor b) and (a eqv not b) and a)'
+  >>> combine(("(a and (a or b))", "(a or b or c)"), intersect=False)
+  '(a or b or c)'
+  >>> combine(("(a or b)", "(not (a or b))"), intersect=False)
+  ''
+  >>> combine(("(a or b)", "(not (a or b))"))
+  '(0)'
+  >>> combine(("not a", "not b", "a or b"))
+  '(0)'
+  >>> combine(("a", "b", "not (a and b)"))
+  '(0)'
+  >>> combine(("not (not a)", "yes"))
+  '(a)'
+  """
+  operands = []
+  for condition in conditions:
+    if condition:
+      operands.append(parse(condition[1:] if condition[0] == "$" else condition))
+    elif not intersect:
+      return ""
+  if not operands:
+    return ""
+  tree = junction(AND if intersect else OR, operands)
+  if tree is TRUE:
+    return ""
+  text = write(tree)
+  return text if is_enclosed(text) else f"({text})"
@@ -0,0 +1,65 @@
+"""
+Deduplication of repeated expansions, used by the token engine with the --dedupe option.
+Commands such as @solve(M_base), @reset_to(All, _baseline), or $FIX All; expand to the same text many times,
+e.g. once per shock and variation in the $FOR grid of a shock driver.
+When a large expansion (at least MIN_SIZE characters) is emitted again, it is written once to Expanded/inc_<hash>.gms,
+and each repeat is replaced by a $BATINCLUDE of that file. The first occurrence is kept in place,
+so expansions that are only emitted once are never written to a separate file.
+Only expansions of the commands in DEDUPLICATED_COMMANDS which start on their own line, directly in the expanded file, are replaced,
+as included text is always inserted as whole lines.
+Expansions which differ only by their arguments are not parameterized, but are deduplicated per distinct set of arguments.
+"""
+import hashlib
+import os
+
+DEDUPLICATED_COMMANDS = ("user_function", "loop", "fix", "fix_run", "solve", "display", "display_all")
+MIN_SIZE = 4096
+
+
+def at_line_start(buffer):
+  """Return True if the text of buffer ends with a line break followed by whitespace only"""
+  for segment in reversed(buffer.segments):
+    line_break = segment.rfind("\n")
+    tail = segment[line_break + 1:]
+    if tail and not tail.isspace():
+      return False
+    if line_break >= 0:
+      return True
+  return not buffer.length  # Text written to the file already is not at a line start
+
+
+class Deduplicator:
+  """Writes repeated expansions to include files, and emits a $BATINCLUDE of the file in their place"""
+
+  def __init__(self, directory, include_directory, transform):
+    self.directory = directory  # Folder of the include files
+    self.include_directory = include_directory  # Folder of the include files relative to the working directory of GAMS
+    self.transform = transform  # Function returning the text written to an include file, e.g. dedenting dollar commands
+    self.seen = set()  # Hashes of the large expansions emitted so far
+    self.files = set()  # Hashes of the expansions written to include files
+    self.repeats = 0
+    self.saved_size = 0
+
+  def emit(self, text, output):
+    """Append text of an expansion to output, or a $BATINCLUDE of it if the same expansion has been emitted before"""
+    if len(text) < MIN_SIZE or not at_line_start(output):
+      output += text
+      return
+    digest = hashlib.sha1(text.encode()).hexdigest()[:16]
+    if digest not in self.seen:
+      self.seen.add(digest)
+      output += text
+      return
+    file_name = f"inc_{digest}.gms"
+    if digest not in self.files:
+      with open(os.path.join(self.directory, file_name), "w") as f:
+        f.write(self.transform(text))
+      self.files.add(digest)
+    include = f'\n$batinclude "{os.path.join(self.include_directory, file_name)}"\n'
+    output += include
+    self.repeats += 1
+    self.saved_size += len(text) - len(include)
+
+  def report(self):
+    return (f"Deduplicated expansions: {self.repeats} repeats of {len(self.files)} expansions included from files, "
+            f"{self.saved_size / 1e6:.2f} MB saved")
@@ -20,6 +20,7 @@ Available commands:
     The group command groups together variables so that they can be manipulated together more easily, using other gamY commands such as $FIX, $UNFIX, $LOOP, $DISPLAY, or $GROUP.
     Variable elements can be selectively included in a group using dollar conditions. Note that conditions ALWAYS need to be enclosed in round brackets.
     Groups can be added together (union operation) or removed (complement operation).
+    The conditions combined by these operations are simplified, e.g. repeated conditions are only included once (see conditions.py).
     Example:
     $GROUP G_newGroup
       var1[t]   "label for variable 1"
@@ -66,11 +67,19 @@ Available commands:
     <variable>.up[<variable>] = <upper bound>;
     for each variable.
     If no bounds are given, lower and upper bounds are set to -inf and inf respectively.
+  $SOLVE[(<solve type>, <attribute>=<value>, <...>)] <equations, blocks, and/or models>;
+    Solve a temporary model of the equations, using CNS unless another solve type is given.
+    Model attributes, e.g. holdFixed, optfile, workfactor, or solvelink, are set when the temporary model is declared.
+    The temporary model is declared once for each set of equations and attributes, and reused by later $SOLVE commands.
+    Example:
+    $SOLVE(CNS, holdFixed=1, optfile=1) M_base, -E_myEquation;
   $DISPLAY <variables or groups>;
   $IMPORT <filename>
     Include a separate file in this file. Note that the regular GAMS $INCLUDE still exists (and is faster). Use @IMPORT if imported file should be processed with gamY.
+    Environment variables set with $SET or $SETLOCAL in the imported file are local to it (and the files it imports),
+    while variables set with $SETGLOBAL are visible everywhere.
   $IF <condition expression>: <content> $ENDIF
-    If statement where the condition is evaluated in python.
+    If statement where the condition is evaluated in python. Conditions can only use literals and operators (see if_conditions.py).
   $FOR <python expression>: <content> $ENDFOR
     $For {parameter}, {value} in [("a", 1), ("b",2)]:
       {parameter} = {value};
@@ -86,6 +95,44 @@ Available commands:
 Save/Read options
   As in regular GAMS, runs can be saved and read using the options s=<filename> and r=<filename>
   Group definitions etc. are saved in and read from a pkl file along side the GAMS g00 file.
+  The pkl file is indexed, and groups, blocks, and functions are only loaded when they are used (see savepoint.py).
+  Environment variables inherited from the operating system are not saved. Files saved by earlier versions of gamY can still be read.
+Delta savepoints option
+  --delta_savepoints saves only the groups, blocks, and functions that differ from the savepoint read with r=,
+  referencing that savepoint by its relative path and content hash. The chain of savepoints is resolved when the file is read,
+  so the savepoints it was saved relative to must be kept unchanged. The option is not passed on to GAMS.
+Engine option
+  --engine=<regex|token> selects the parsing engine (default is regex). The option is not passed on to GAMS.
+  The token engine produces the same output as the regex engine, but tokenizes each text only once.
+  The token engine also reuses the expansion of a $LOOP or @function call which is repeated
+  while the groups, blocks, functions, and environment variables it reads are unchanged (see memo.py).
+  The token engine writes the expanded file in chunks while it is expanded (see stream.py),
+  so the memory used scales with the largest single command expansion rather than with the file.
+Lean option
+  --lean drops the comments, banners, blank lines, and redundant $ONLISTING / $OFFLISTING toggles from the expanded file (see lean.py),
+  and reports the reduction in size. The GAMS compilation time is stored next to the expanded file,
+  and the reduction is reported once both the lean and the full output have been compiled. The option is not passed on to GAMS.
+Dedupe option
+  --dedupe writes large expansions which are repeated, e.g. @solve(M_base) in each iteration of a $FOR loop,
+  to Expanded/inc_<hash>.gms files once, and replaces each repeat by a $BATINCLUDE of the file (see dedupe.py).
+  The option requires the token engine (it is an error with the regex engine), and is not passed on to GAMS.
+Coalesce FIX option
+  --coalesce_fix expands consecutive $FIX and $UNFIX commands, separated only by whitespace and comments, together,
+  emitting only the net bound operations of each variable, e.g. '$FIX All; $UNFIX G_endo;' only fixes the exogenous variables,
+  with the conditions of the commands merged (see coalesce.py).
+  The option requires the token engine (it is an error with the regex engine), and is not passed on to GAMS.
+Profile option
+  --profile writes a report of the time and bytes spent on each command type, imported file, and function call site,
+  as <name>.profile.txt and <name>.profile.json in the LST folder. The option is not passed on to GAMS.
+Skip unchanged option
+  --skip_unchanged writes a manifest of the inputs next to the expanded file (see manifest.py).
+  If the source file, the files it imports, the savepoints read, the command line arguments, and the environment variables
+  it reads have not changed since, the expanded file and the savepoint are reused and the precompiler is skipped.
+  The option is not passed on to GAMS.
+Import cache option
+  --import_cache stores the result of parsing each imported file in the Expanded/ImportCache folder (see import_cache.py).
+  When a file is imported again with the same content, and the environment variables, groups, blocks, and functions
+  it reads are unchanged, the stored result is reused instead of parsing the file. The option is not passed on to GAMS.
   $FIX ALL;
   $UNFIX G_myGroup$(subset1[t])
   $FIX var1;
@@ -93,19 +140,19 @@ Save/Read options
     #  then do stuff here
   $EndIf
 Implementation notes
-  The preprocessor uses 'brute force' regular expressions to find and replace the new macro commands.
+  The regex engine uses 'brute force' regular expressions to find and replace the new macro commands.
   Commands are processed in the order they appear and can be nested (using recursive descent parsing).
-  A tokenizer is not used and is unlikely to simplify the code as syntax varies for each command,
-  and only the commands, rather than all the GAMS code, need to be parsed.
-  The program should be rewritten using a tokenizer, lexer, and parser to allow for unlimited nesting of flow control statements,
-  and to make the syntax more robust.
+  After each command the text is searched again from the start, so the processing time grows quadratically with the size of the file.
+  The token engine (see tokenizer.py) uses the same regular expressions to find the extent of each command,
+  but scans the text once, building a tree of commands which is evaluated in a single walk, emitting output into a buffer.
+  Only the text returned by a command is scanned again for new commands, except for imported files which are expanded when imported.
 """
 import sys
 import os
 import shutil
 import subprocess
-import pickle
 import re
+from collections import ChainMap
 from math import ceil, floor
 from heapq import heappush
 from timeit import default_timer as timer
@@ -113,24 +160,69 @@ from timeit import default_timer as timer
 import itertools # Useful in FOR loops in MAKRO
 
 # gamY data objects
-from classes import Variable, Equation, Function, MockMatch, Group, Block, CaseInsensitiveDict
+from classes import Variable, Equation, Function, MockMatch, Group, Block, FoldedDict, TextBuffer, RecencyDict
 
 #  The regex patterns used to match commands
-from patterns import PATTERNS
+from patterns import PATTERNS, TOP_DOWN_COMMANDS, COMMENT_PATTERNS
+
+#  Tokenizer used by the token engine
+from tokenizer import tokenize
+
+#  Profiler used with the --profile option
+from profiler import Profiler
+
+#  Cache of parsed imports used with the --import_cache option
+from import_cache import ImportCache, ImportRecorder, fingerprint, dump_effects, load_effects
+
+#  Manifest of inputs used with the --skip_unchanged option
+from manifest import Manifest
+
+#  Lazily loaded savepoint format used by the s= and r= options
+import savepoint
+
+#  Boolean algebra used to combine and simplify the conditions of groups
+import conditions
+
+#  Cached evaluation of $IF conditions
+import if_conditions
+
+#  Compiled templates of $LOOP bodies
+from templates import compile_template
+
+#  Memoization of repeated $LOOP and @function expansions, used by the token engine
+from memo import ExpansionMemo, MemoRecorder, MEMOIZED_COMMANDS
+
+#  Streaming output of the expanded file, used by the token engine
+from stream import StreamBuffer
+
+#  Lean output of the expanded file, used with the --lean option
+import lean
+
+#  Deduplication of repeated expansions into include files, used by the token engine with the --dedupe option
+from dedupe import Deduplicator, DEDUPLICATED_COMMANDS
+
+#  Coalescing of consecutive $FIX and $UNFIX commands, used by the token engine with the --coalesce_fix option
+from coalesce import find_runs, net_operations, BoundOperation
+
+ENGINES = ("regex", "token")
+FOR_CHUNK_SIZE = 1 << 16  # Characters of $FOR iterations tokenized at a time by the token engine
 
 
 class Precompiler:
   """Object with methods to parse each gamY command"""
 
-  def __init__(self, file_path, patterns=PATTERNS, add_adjust=None, mult_adjust=None):
-    self.groups = CaseInsensitiveDict({"all": {}})
-    self.groups_conditions = CaseInsensitiveDict({"all": {}})
-    self.pgroups = CaseInsensitiveDict({"all": {}})
-    self.pgroups_conditions = CaseInsensitiveDict({"all": {}})
-    self.blocks = CaseInsensitiveDict()
-    self.globals = dict(os.environ)
-    self.user_functions = CaseInsensitiveDict()
-    self.locals = {}
+  def __init__(self, file_path, patterns=PATTERNS, add_adjust=None, mult_adjust=None, engine="regex", profile=False,
+               import_cache=False, delta_savepoints=False, lean=False, dedupe=False, coalesce_fix=False):
+    self.groups = FoldedDict({"all": RecencyDict()})
+    self.groups_conditions = FoldedDict({"all": RecencyDict()})
+    self.pgroups = FoldedDict({"all": RecencyDict()})
+    self.pgroups_conditions = FoldedDict({"all": RecencyDict()})
+    self.blocks = FoldedDict()
+    self.equation_index = None  # Equations of all blocks by name, built when first needed (see equations)
+    self.globals = dict(os.environ)  # Environment of the operating system, and $SETGLOBAL
+    self.user_functions = FoldedDict()
+    self.locals = ChainMap()  # Command line arguments, and $SETLOCAL, with a scope for each imported file, innermost first
+    self.scope = ChainMap(self.locals, self.globals)  # Locals overwrite globals
 
     self.has_read_file = False
 
@@ -146,10 +238,30 @@ class Precompiler:
       self.groups_conditions[term] = {}
 
     self.model_counter = 0  # As models cannot be redefined, we increment the names of temporary models defined
+    self.temp_models = {}  # Name of the temporary model declared by $SOLVE for each fingerprint of equations and attributes
 
     self.patterns = patterns
+    self.engine = engine
     self.file_path = os.path.abspath(file_path)
     self.file_dir, self.file_name = os.path.split(self.file_path)
+    self.profiler = Profiler(self.file_name) if profile else None
+    self.import_cache = None
+    if import_cache:
+      settings = (add_adjust, mult_adjust, coalesce_fix, [pattern.pattern for pattern in patterns.values()])
+      self.import_cache = ImportCache(os.path.join(self.file_dir, "Expanded", "ImportCache"), settings)
+    self.recorders = []  # Recorders of the imported files being parsed, innermost last (see import_cache.py)
+    self.inputs = set()  # Environment variables and files read, as (kind, name) (see manifest.py)
+    self.delta_savepoints = delta_savepoints
+    self.lean = lean
+    self.lean_filter = None  # Filter of the output with the --lean option (see lean.py)
+    self.dedupe = dedupe
+    self.deduplicator = None  # Writer of repeated expansions to include files with the --dedupe option (see dedupe.py)
+    self.coalesce_fix = coalesce_fix
+    self.output = None  # Output buffer of the expanded file while it is written by the token engine
+    self.savepoint_parent = None  # Index of the savepoint read, which delta savepoints are saved relative to
+    self.versions = {}  # Version stamp of each part of the state, as (kind, name), increased when it changes (see memo.py)
+    self.memo = ExpansionMemo()  # Only used by the token engine, which can be selected after initialization
+    self.memo_recorders = []  # Recorders of the memoized commands being expanded, innermost last
 
     # Check that LST folder exists
     list_file_dir = os.path.join(self.file_dir, "LST")
@@ -159,13 +271,12 @@ class Precompiler:
     self.list_file_path = os.path.join(list_file_dir, list_file_name)
 
     #  In cases where a command should be parsed by gamY, but also left for GAMS to parse, we replace special characters temporarily
+    #  The token engine does not need the substitutions, as it masks comments by their offsets instead (see tokenizer.py)
     self.DOLLAR_SUB = "¤dollar¤"
     self.SEMICOLON_SUB = "¤semicolon¤"
     self.PERCENT_SUB = "¤percent¤"
     self.AT_SUB = "¤at¤"
-    self.star_comment_pattern = re.compile(r"^\*.*", re.MULTILINE)
-    self.hashtag_comment_pattern = re.compile(r"\#.*", re.MULTILINE)
-    self.block_comment_pattern = re.compile(r"^\$ontext.*?\$offtext", re.IGNORECASE | re.MULTILINE | re.DOTALL)
+    self.star_comment_pattern, self.hashtag_comment_pattern, self.block_comment_pattern = COMMENT_PATTERNS
 
     #  Maps between regex patterns and the correpsonding method for each gamY command
     self.recursive_commands = [
@@ -196,10 +307,32 @@ class Precompiler:
 
   @property
   def equations(self):
-    return {k: v for block in self.blocks.values() for k, v in block.items()}
+    """
+    Return index of the equations of all blocks by name.
+    The index is built when first needed, as the blocks of a savepoint are loaded lazily,
+    and is then updated as blocks are defined (see define_block).
+    """
+    self.track_read("blocks")
+    if self.equation_index is None:
+      self.equation_index = FoldedDict()
+      for block in self.blocks.values():
+        self.equation_index.update(block)
+    return self.equation_index
+
+  def define_block(self, name, block):
+    """Define block (or model) and add its equations to the index of equations"""
+    if self.equation_index is not None:
+      if name in self.blocks:
+        self.equation_index = None  # Equations of a redefined block can be shadowed by later blocks, so the index is rebuilt
+      else:
+        for key, eq in block.items():
+          if self.equation_index.get(key) is not eq:  # Models consist of equations which are already in the index
+            self.equation_index[key] = eq
+    self.blocks[name] = block
 
   def warning(self, msg):
     print("WARNING: " + msg)
+    self.track_effect(("warning", msg))  # Warnings are printed again when a cached import is reused
     return "**** " + msg
 
   def log(self, msg):
@@ -213,18 +346,76 @@ class Precompiler:
     sys.exit(error_text)
 
   def __call__(self):
-    #  Read GAMS file
+    text = self.read_source()
+    if self.engine == "token":
+      text = self.dedent_dollar(self.expand(text))
+    else:
+      self.processed_text = ""
+      text = self.parse(text, top_level=True)
+      text = self.processed_text + text
+      text = self.dedent_dollar(text)
+      text = self.restore_temporary_substitutions(text)
+    if self.lean:
+      self.lean_filter = lean.LeanFilter()
+      text = self.lean_filter(text) + self.lean_filter.close()
+    return text
+
+  def read_source(self):
+    """Return text of the GAMS file to be expanded"""
     with open(self.file_path, 'r') as f:
       text = "\n" + f.read()
     if not self.has_read_file:
       text = "$ONEOLCOM\n$EOLCOM #\n\n" + text  # Add option for # comments if this is the first file being run
-    self.processed_text = ""
-    text = self.parse(text, top_level=True)
-    text = self.processed_text + text
+    if self.engine not in ENGINES:
+      self.error(f"Unknown engine '{self.engine}', use one of: {', '.join(ENGINES)}")
+    if self.dedupe and self.engine != "token":
+      self.error("The --dedupe option requires the token engine, use --engine=token")
+    if self.coalesce_fix and self.engine != "token":
+      self.error("The --coalesce_fix option requires the token engine, use --engine=token")
+    return text
+
+  def write(self, path):
+    """
+    Expand the GAMS file and write the result to path.
+    The token engine writes the output in chunks while it is expanded (see stream.py), the regex engine writes it at once.
+    The output is written to a temporary file, which only replaces the file at path if the precompiler succeeds.
+    """
+    temp_path = path + ".tmp"
+    try:
+      with open(temp_path, 'w') as f:
+        if self.engine == "token":
+          if self.lean:
+            self.lean_filter = lean.LeanFilter()
+            output = StreamBuffer(f, lambda text: self.lean_filter(self.dedent_dollar(text)))
+          else:
+            output = StreamBuffer(f, self.dedent_dollar)
+          if self.dedupe:
+            directory = os.path.dirname(os.path.abspath(path))
+            self.deduplicator = Deduplicator(directory, os.path.relpath(directory, self.file_dir), self.include_text)
+          self.output = output
+          self.evaluate(tokenize(self.read_source(), patterns=self.patterns), output)
+          output.close()
+          if self.lean:
+            f.write(self.lean_filter.close())
+        else:
+          f.write(self())
+      os.replace(temp_path, path)
+    finally:
+      self.output = None
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+  def include_text(self, text):
+    """Return text of an expansion written to an include file with the --dedupe option"""
     text = self.dedent_dollar(text)
-    return self.restore_temporary_substitutions(text)
+    if self.lean:
+      lean_filter = lean.LeanFilter(listing=None)
+      text = lean_filter(text) + lean_filter.close()
+    return text
 
   def parse(self, text, top_level=False):
+    if self.engine == "token":
+      return self.expand(text)
     while True:
       text = self.clean_comments(text)
       match = self.patterns["Any"].search(text)
@@ -245,6 +436,112 @@ class Precompiler:
       else:
         return self.process_command(text)  # Process commands when inner scope of recursion is reached
 
+  def expand(self, text):
+    """
+    Token engine: tokenize the text once and evaluate the resulting command tree in a single walk.
+    """
+    output = TextBuffer()
+    self.evaluate(tokenize(text, patterns=self.patterns), output)
+    return str(output)
+
+  def evaluate(self, nodes, output):
+    """
+    Append the expansion of each node to the output buffer.
+    Commands nested inside a command are expanded before the command itself, except for flow control commands which are processed top down.
+    The text returned by each command is expanded in turn, as it can contain new commands.
+    Expansions are spliced into the output buffer as segments, so the output is only joined once.
+    """
+    if self.coalesce_fix:
+      nodes = find_runs(nodes)
+    for node in nodes:
+      if isinstance(node, str):
+        output += node
+        continue
+      if not self.profiler:
+        self.evaluate_node(node, output)
+        continue
+      self.profile_start(node.kind, node.text)
+      emitted_bytes = len(output)
+      try:
+        self.evaluate_node(node, output)
+      finally:
+        self.profiler.stop(len(output) - emitted_bytes)
+
+  def evaluate_node(self, node, output):
+    """Expand a command node of the command tree, appending the result to output"""
+    target = output
+    if self.deduplicator and output is self.output and node.kind in DEDUPLICATED_COMMANDS:
+      target = TextBuffer()  # Expanded separately, to be replaced by an include file if it is repeated
+    if node.kind == "fix_run":
+      replacement_text = self.fix_unfix_run([self.command_text(command) for command in node.commands])
+      self.evaluate(tokenize(replacement_text, patterns=self.patterns), target)
+    elif node.kind in MEMOIZED_COMMANDS:
+      self.expand_memoized(node, self.command_text(node), target)
+    else:
+      self.expand_command(node, self.command_text(node), target)
+    if target is not output:
+      self.deduplicator.emit(str(target), output)
+
+  def command_text(self, node):
+    """Return text of a command, with the commands nested inside it expanded unless it is processed top down"""
+    if node.kind in TOP_DOWN_COMMANDS:
+      return node.text
+    inner = TextBuffer(node.text[0])
+    self.evaluate(node.children, inner)
+    return str(inner)
+
+  def expand_command(self, node, command_text, output):
+    """Process a command and append its expansion to the output buffer"""
+    kind = node.kind
+    if kind == "for_loop":  # Stream the iterations into the output buffer, in chunks of about FOR_CHUNK_SIZE characters
+      chunk, size = [], 0
+      for body in self.for_loop_iterations(MockMatch(*node.groups)):  # The header was read by the tokenizer
+        chunk.append(body)
+        size += len(body)
+        if size >= FOR_CHUNK_SIZE:
+          self.evaluate(tokenize("".join(chunk), patterns=self.patterns), output)
+          chunk, size = [], 0
+      if chunk:
+        self.evaluate(tokenize("".join(chunk), patterns=self.patterns), output)
+      return
+    if kind == "if":  # The header was read by the tokenizer, so the command is not matched again
+      replacement_text = self.if_statements(MockMatch(*node.groups), command_text)
+    else:
+      replacement_text = self.process_command(command_text)
+    if replacement_text == command_text:
+      output += replacement_text  # Nothing was processed, do not expand the same command again
+    elif kind == "import":
+      output += replacement_text  # Imported files are expanded by import_file
+    else:
+      self.evaluate(tokenize(replacement_text, patterns=self.patterns), output)
+
+  def expand_memoized(self, node, command_text, output):
+    """
+    Append the expansion of a $LOOP or @function command to the output buffer,
+    reusing the stored expansion if the state it read is unchanged (see memo.py).
+    """
+    kind = node.kind
+    entry = self.memo.lookup(command_text, self.versions)
+    if self.profiler:
+      name = self.patterns[kind].match(command_text).group(2 if kind == "loop" else 1)
+      self.profiler.memo(f"$LOOP {name}" if kind == "loop" else f"@{name}", entry is not None)
+    if entry is not None:
+      dependencies, expanded_text = entry
+      for dependency in dependencies:
+        self.track_read(*dependency)  # Enclosing recorders depend on the same state
+      output += expanded_text
+      return
+    recorder = MemoRecorder()
+    self.memo_recorders.append(recorder)
+    expansion = TextBuffer()
+    try:
+      self.expand_command(node, command_text, expansion)
+    finally:
+      self.memo_recorders.pop()
+    expanded_text = str(expansion)
+    self.memo.store(command_text, recorder, expanded_text)
+    output += expanded_text
+
   def round_parentheses(self, text):
     return text.replace("[", "(").replace("]", ")")
 
@@ -253,33 +550,251 @@ class Precompiler:
       match = self.patterns[command].fullmatch(text)  # match method is used (rather than search) to avoid matching inside commands when parsing top down
       if match:
         #  print("***MATCH***", command)
-        text = text.replace(match.group(0), func(match, text), 1)
+        if self.profiler and self.engine == "regex":  # The token engine profiles commands when evaluating them
+          self.profile_start(command, text)
+          replacement_text = ""
+          try:
+            replacement_text = func(match, text)
+          finally:
+            self.profiler.stop(len(replacement_text))
+        else:
+          replacement_text = func(match, text)
+        text = text.replace(match.group(0), replacement_text, 1)
     return text
 
+  def profile_start(self, command, text):
+    name, input_bytes = None, len(text)
+    if command in ("import", "user_function"):
+      name = self.patterns[command].match(text).group(1)
+    if command == "import" and os.path.isfile(os.path.join(self.file_dir, name)):
+      input_bytes = os.path.getsize(os.path.join(self.file_dir, name))  # Count the size of the imported file as input
+    self.profiler.start(command, name, input_bytes)
+
+  def state_value(self, kind, name):
+    """Return the part of the precompiler state that an imported file can depend on (see import_cache.py)"""
+    if kind == "env":
+      return self.locals[name] if name in self.locals else self.globals.get(name)
+    if kind == "group":
+      return self.groups.get(name), self.groups_conditions.get(name)
+    if kind == "pgroup":
+      return self.pgroups.get(name), self.pgroups_conditions.get(name)
+    if kind == "variable":
+      return self.groups["all"].get(name)
+    if kind == "pvariable":
+      return self.pgroups["all"].get(name)
+    if kind == "block":
+      return self.blocks.get(name)
+    if kind == "blocks":
+      return self.blocks
+    if kind == "function":
+      return self.user_functions.get(name)
+    if kind == "model_counter":
+      return self.model_counter
+    if kind == "temp_model":
+      return self.temp_models.get(name)
+    if kind == "file":
+      if not os.path.isfile(name):
+        return None
+      with open(name, "r") as f:
+        return f.read()
+
+  def state_objects(self, kind, name):
+    """Return (location, object) of the variables, equations, and functions read as part of the state"""
+    if kind in ("group", "pgroup"):
+      group = self.state_value(kind, name)[0]
+      return [((kind, name, var_name), var) for var_name, var in (group or {}).items()]
+    if kind in ("variable", "pvariable", "function"):
+      obj = self.state_value(kind, name)
+      return [((kind, name), obj)] if obj is not None else []
+    if kind in ("block", "blocks"):
+      blocks = self.blocks if kind == "blocks" else {name: self.blocks.get(name) or {}}
+      return [(("block", block_name, eq_name), eq) for block_name, block in blocks.items() for eq_name, eq in block.items()]
+    return []
+
+  def resolve_location(self, location):
+    """Return object in the current state from a location returned by state_objects"""
+    kind, name, *item = location
+    if kind == "group":
+      return self.groups[name][item[0]]
+    if kind == "pgroup":
+      return self.pgroups[name][item[0]]
+    if kind == "block":
+      return self.blocks[name][item[0]]
+    return self.state_value(kind, name)
+
+  def track_read(self, kind, name=None):
+    """Record that the state is read while parsing imported files or expanding memoized commands"""
+    if kind in ("env", "file"):
+      self.inputs.add((kind, name))
+    if not self.recorders and not self.memo_recorders:
+      return
+    if kind not in ("env", "file", "model_counter", "blocks"):
+      name = name.lower()
+    key = (kind, name)
+    for recorder in self.memo_recorders:
+      recorder.read(key, self.versions.get(key, 0))
+    recorders = [recorder for recorder in self.recorders if recorder.needs(key)]
+    if recorders:
+      value_fingerprint = fingerprint(self.state_value(kind, name))
+      objects = self.state_objects(kind, name)
+      for recorder in recorders:
+        recorder.read(key, value_fingerprint, objects)
+
+  def track_effect(self, effect):
+    """
+    Record a change of the state, increasing the version stamps of the parts changed (see memo.py).
+    While parsing imported files, the change is recorded so that it can be replayed by apply_effect.
+    Objects in the effect are pickled when the import has been parsed.
+    """
+    for recorder in self.memo_recorders:
+      recorder.write()
+    kind = effect[0]
+    if kind == "group":
+      _, parameter_group, name, _, _ = effect
+      keys = [("pgroup" if parameter_group else "group", name.lower())]
+    elif kind == "merge_all":  # The version stamps are increased by merge_all, if the "all" group changes
+      if not self.recorders:
+        return
+      _, parameter_group, new_group = effect
+      keys = [("pvariable" if parameter_group else "variable", name.lower()) for name in new_group]
+    elif kind == "variable":
+      keys = [("variable", effect[1].lower())]
+    elif kind in ("block", "function"):
+      keys = [(kind, effect[1].lower())]
+    elif kind == "env":
+      _, scope, key, _ = effect
+      keys = [("env", key)] if scope == "local" or key not in self.locals else []
+    elif kind == "model_counter":
+      keys = [("model_counter", None)]
+    elif kind == "temp_model":
+      keys = [("temp_model", effect[1])]
+    else:  # Changes of equations in place, or warnings
+      keys = []
+    if kind != "merge_all":
+      for key in keys:
+        self.changed(key)
+      if kind == "variable":
+        self.changed(("group", "all"))
+      elif kind == "block":
+        self.changed(("blocks", None))
+    for recorder in self.recorders:
+      recorder.write(keys, effect)
+
+  def changed(self, key):
+    """Increase the version stamp of a part of the state, invalidating memoized expansions which read it"""
+    self.versions[key] = self.versions.get(key, 0) + 1
+
+  def apply_effect(self, effect):
+    """Replay a change of the state recorded while parsing an imported file"""
+    kind = effect[0]
+    if kind == "group":
+      _, parameter_group, name, group, conditions = effect
+      GROUPS, CONDITIONS = (self.pgroups, self.pgroups_conditions) if parameter_group else (self.groups, self.groups_conditions)
+      GROUPS[name] = group
+      CONDITIONS[name] = conditions
+    elif kind == "merge_all":
+      _, parameter_group, new_group = effect
+      self.merge_all(parameter_group, new_group)
+    elif kind == "variable":
+      _, name, var = effect
+      self.groups["all"][name] = var
+    elif kind == "block":
+      _, name, block = effect
+      self.define_block(name, block)
+    elif kind == "function":
+      _, name, func = effect
+      self.user_functions[name] = func
+    elif kind == "env":
+      _, scope, key, value = effect
+      if scope == "global":
+        self.globals[key] = value
+      else:
+        self.locals[key] = value
+    elif kind == "model_counter":
+      self.model_counter = effect[1]
+    elif kind == "temp_model":
+      _, key, model_name = effect
+      self.temp_models[key] = model_name
+    elif kind == "equation_conditions":
+      _, eq, conditions = effect
+      eq.conditions = conditions
+    elif kind == "warning":
+      print("WARNING: " + effect[1])
+    self.track_effect(effect)
+
+  def parse_import(self, file_name, text):
+    """
+    Parse the text of an imported file.
+    With the --import_cache option, a cached result is reused if the file has been parsed before with the same dependencies.
+    """
+    if not self.import_cache:
+      return self.parse(text)
+    key = self.import_cache.key(file_name, text, self.engine)
+    for dependencies, effects, replacement_text in self.import_cache.load(key):
+      if all(fingerprint(self.state_value(*dependency)) == value_fingerprint
+             for dependency, value_fingerprint in dependencies.items()):
+        for dependency in dependencies:
+          self.track_read(*dependency)
+        for effect in load_effects(effects, self.resolve_location):
+          self.apply_effect(effect)
+        self.import_cache.hits += 1
+        return replacement_text
+
+    self.import_cache.misses += 1
+    recorder = ImportRecorder()
+    self.recorders.append(recorder)
+    try:
+      replacement_text = self.parse(text)
+    finally:
+      self.recorders.pop()
+    effects = dump_effects(recorder.effects, recorder.external)
+    self.import_cache.store(key, (recorder.dependencies, effects, replacement_text))
+    return replacement_text
+
   def read(self, file_name):
     """
     Read blocks, groups, and variables from saved file if the r=<file_name> option is used.
     """
     self.has_read_file = True
+    path = os.path.join(self.file_dir, file_name) + ".pkl"
     try:
-      with open(os.path.join(self.file_dir, file_name) + ".pkl", 'rb') as f:
-        self.blocks, self.groups, self.groups_conditions, self.pgroups, self.pgroups_conditions, loaded_globals, self.user_functions = pickle.load(f)
-        print("Precompiler file read: " + file_name + ".pkl")
+      start_time = timer()
+      sections, loaded_globals, self.savepoint_parent = savepoint.read(path)
+      read_time = timer() - start_time
+      size = os.path.getsize(path)
+      print(f"Precompiler file read: {file_name}.pkl ({size / 1e3:.1f} kB in {read_time:.3f} seconds)")
+      if self.profiler:
+        self.profiler.record("savepoints", file_name + ".pkl", read_time, size)
+      for section, mapping in sections.items():
+        setattr(self, section, mapping)
+      self.equation_index = None
+      self.memo.clear()
       self.globals.update(loaded_globals)
+      #  Functions saved by the regex engine can contain temporary substitutions, which are not restored by the token engine
+      for func in self.user_functions.values():
+        func.expression = self.restore_temporary_substitutions(func.expression)
     except FileNotFoundError:
       self.warning(f"gamY read file not found ({file_name}.pkl), macro groups have been reset")
+    except ValueError as e:
+      self.error(str(e))
 
   def save(self, file_name):
     """
-    Save dicts of blocks, groups, and variables in pickle file if s=<file_name> option is used
+    Save dicts of blocks, groups, and variables in savepoint file if s=<file_name> option is used
+    Environment variables inherited from the operating system are not saved.
+    With the --delta_savepoints option, only the changes relative to the savepoint read are saved.
     """
-    with open(os.path.join(self.file_dir, file_name) + ".pkl", 'wb') as f:
-      pickle.dump(
-        (self.blocks, self.groups, self.groups_conditions, self.pgroups, self.pgroups_conditions, self.globals, self.user_functions),
-        f, pickle.HIGHEST_PROTOCOL)
+    savepoint.save(
+      os.path.join(self.file_dir, file_name) + ".pkl",
+      {section: getattr(self, section) for section in savepoint.SECTIONS},
+      {key: value for key, value in self.globals.items() if os.environ.get(key) != value},
+      parent=self.savepoint_parent if self.delta_savepoints else None,
+    )
 
   def comment_out(self, text):
     return_string = text.replace("\n", "\n#")
+    if self.engine == "token":
+      return return_string
     return self.clean_comments(return_string)
 
   def clean_comments(self, text):
@@ -324,12 +839,14 @@ class Precompiler:
     Replace environmental variables with their value, e.g. %variable_name%
     """
     key = match.group(1)
+    self.track_read("env", key)
 
-    in_scope = self.in_scope()
-    if key in in_scope:
-      return in_scope[key]
+    if key in self.scope:
+      return self.scope[key]
     else:
       self.warning(f"\\%{key}\\% is not defined and was not replaced")
+      if self.engine == "token":
+        return match.group(0)  # The token engine does not expand a command again if it is returned unchanged
       return self.PERCENT_SUB + key + self.PERCENT_SUB
 
   def user_function(self, match, text):
@@ -337,6 +854,7 @@ class Precompiler:
     Insert user defined function call, e.g. @my_funct(), defined using $FUNCTION
     """
     func_name, args = match.group(1), match.group(2)
+    self.track_read("function", func_name)
     if func_name not in self.user_functions:
       self.error(f"@{func_name} has not been defined: {match.group(0)}")
 
@@ -348,12 +866,16 @@ class Precompiler:
       replacement_text = replacement_text.replace(arg_name, arg.strip())
     return replacement_text
 
-  def in_scope(self):
-    in_scope = {}
-    in_scope.update(self.globals)
-    in_scope.update(self.locals)  # locals overwrite globals
-    in_scope = {k: v for k, v in in_scope.items()}
-    return in_scope
+  def enter_scope(self):
+    """Start the local scope of an imported file"""
+    self.locals.maps.insert(0, {})
+
+  def exit_scope(self):
+    """End the local scope of an imported file, so that the importing file sees its own values again"""
+    for key in self.locals.maps.pop(0):
+      self.changed(("env", key))
+      for recorder in self.recorders:
+        recorder.written.discard(("env", key))  # Reading the variable again is a dependency of enclosing imports
 
   def set_env_variable(self, match, text, eval_command=False):
     """
@@ -366,8 +888,10 @@ class Precompiler:
       val = str(eval(val))
     if match.group(1).lower() == "global":
       self.globals[key] = val
+      self.track_effect(("env", "global", key, val))
     else:
       self.locals[key] = val
+      self.track_effect(("env", "local", key, val))
     # replacement_text = match.group(0).replace("$", self.DOLLAR_SUB).lstrip()
     # return replacement_text
     return ""
@@ -386,7 +910,7 @@ class Precompiler:
 
     if not id_:
         id_ = " "
-    if f"$IF{id_}" in expression:
+    if f"$IF{id_}" in self.remove_comments(expression):
       self.error(
         f"""
         Nested IF statements must be identified with id numbers (e.g. $IF1 .. $ENDIF1).
@@ -395,14 +919,7 @@ class Precompiler:
         """
       )
 
-    condition = re.sub(r"(?<![=><!])=(?![=><!])", "==", condition)
-    condition = re.sub(r"<>", "!=", condition)
-    condition = re.sub(r"(?<![a-zA-Z])EQ(?![a-zA-Z])", "==", condition, flags=re.IGNORECASE)
-    condition = re.sub(r"(?<![a-zA-Z])NE(?![a-zA-Z])", "!=", condition, flags=re.IGNORECASE)
-    condition = re.sub(r"(?<![a-zA-Z])LT(?![a-zA-Z])", "<", condition, flags=re.IGNORECASE)
-    condition = re.sub(r"(?<![a-zA-Z])GT(?![a-zA-Z])", ">", condition, flags=re.IGNORECASE)
-    condition = re.sub(r"(?<![a-zA-Z])LE(?![a-zA-Z])", "<=", condition, flags=re.IGNORECASE)
-    condition = re.sub(r"(?<![a-zA-Z])GE(?![a-zA-Z])", ">=", condition, flags=re.IGNORECASE)
+    condition = if_conditions.normalize(condition)
 
     condition_trunc = condition.split("\n")[0]
     replacement_text = (
@@ -412,7 +929,7 @@ class Precompiler:
     )
 
     try:
-      if eval(condition.lower()):
+      if if_conditions.evaluate(condition):
         replacement_text += expression
       else:
         replacement_text += "# If condition evaluated to false"
@@ -437,12 +954,19 @@ class Precompiler:
       "\n#  Import file: " + file_name +
       "\n# " + "-" * 100 + "\n"
     )
+    self.track_read("file", file_name)
     if os.path.isfile(file_name):
       try:
         with open(file_name, "r") as f:
-          replacement_text += self.parse("\n"+f.read())
+          text = "\n" + f.read()
       except FileNotFoundError:
         replacement_text += self.warning(f"File was found, but could not be read: '{file_name}'")
+      else:
+        self.enter_scope()
+        try:
+          replacement_text += self.parse_import(file_name, text)
+        finally:
+          self.exit_scope()
     else:
       replacement_text += self.warning(f"File not found: '{file_name}'")
 
@@ -482,7 +1006,7 @@ class Precompiler:
 
     if not id_:
         id_ = " "
-    if f"$REGED{id_}" in expression:
+    if f"$REGED{id_}" in self.remove_comments(expression):
       self.error(
         f"""
         Nested REGED statements must be identified with id numbers (e.g. $REGED1 .. $ENDREGED1).
@@ -535,15 +1059,18 @@ class Precompiler:
 
     block_name = match.group(1)
     content = self.remove_comments(match.group(2))
-    replacement_text = (
+    replacement_text = TextBuffer(
       "\n# " + "-"*ceil(50-len(block_name)/2) + block_name + "-"*floor(50-len(block_name)/2) +
       "\n#  Initialize " + block_name + " equation block" +
       "\n# " + "-"*100 + "\n"
     )
-    self.blocks[block_name] = Block()
+    block = Block()
+    for term in self.adjustment_terms:
+      self.track_read("group", term)
+      self.track_read("group", f"{term}_{block_name}")
     for e_match in equation_pattern.finditer(content):
       eq = Equation(*[v if v is not None else "" for v in e_match.groups()])
-      self.blocks[block_name][eq.name] = eq
+      block[eq.name] = eq
       replacement_text += f"EQUATION {eq.name}{eq.sets};"
 
       RHS = eq.RHS
@@ -558,6 +1085,7 @@ class Precompiler:
         j_var = Variable(j_name, eq.sets, docstring)
         self.groups[self.add_adjust][j_name] = j_var
         self.groups["all"][j_name] = j_var
+        self.track_effect(("variable", j_name, j_var))
         self.groups[j_group_name][j_name] = j_var
         if RHS.strip()[0] == "-":
           RHS = f"{self.add_adjust}{eq._name}{eq.sets} {RHS}"
@@ -574,12 +1102,19 @@ class Precompiler:
         j_var = Variable(j_name, eq.sets, docstring)
         self.groups[self.mult_adjust][j_name] = j_var
         self.groups["all"][j_name] = j_var
+        self.track_effect(("variable", j_name, j_var))
         self.groups[j_group_name][j_name] = j_var
         RHS = f"(1+{self.mult_adjust}{eq._name}{eq.sets}) * ({RHS})"
       replacement_text += "\n"+f"{eq.name}{eq.sets}{eq.conditions}.. {eq.LHS} =E= {RHS};"+"\n"
 
+    self.define_block(block_name, block)
+    self.track_effect(("block", block_name, block))
+    for term in self.adjustment_terms:
+      for name in (term, f"{term}_{block_name}"):
+        self.track_effect(("group", False, name, self.groups[name], self.groups_conditions[name]))
+
     replacement_text += f"$MODEL {block_name} {block_name};"
-    return replacement_text
+    return str(replacement_text)
 
   def model_define(self, match, text):
     """
@@ -592,63 +1127,74 @@ class Precompiler:
       E_eq
     ;
     """
-    item_pattern = re.compile(r"""
-      (?:^|\,)             #  Check only beginning of line or after a comma.
-      \s*                  #  Ignore whitespace
-      (\-)?                #  Optional MINUS character if block or equation is to be removed instead of added ($1)
-      ([^\,\;\s]+)         #  Name of equation ($2)
-    """, re.VERBOSE | re.MULTILINE)
-
-    equations = CaseInsensitiveDict({eq.name: eq for block in self.blocks.values() for eq in block.values()})
     model_name = match.group(1)
-    content = self.remove_comments(match.group(2))
+    return self.declare_model(model_name, self.model_equations(model_name, match.group(2)))
+
+  def declare_model(self, model_name, new_model):
+    """Return GAMS declaration of a model of the equations in new_model, which is also defined as a block"""
     replacement_text = (
       "\n# " + "-" * 100 +
       "\n#  Define " + model_name + " model" +
       "\n# " + "-" * 100 +
       "\nModel " + model_name + " /\n"
     )
-    new_model = Block()
-    for item_match in item_pattern.finditer(content):
-      remove = item_match.group(1)
-      name = item_match.group(2)
-      if name in self.blocks:
-        for eq in self.blocks[name].values():
-          if remove:
-            new_model.pop(eq.name)
-          else:
-            new_model[eq.name] = eq
-      elif name in equations:
-        if remove:
-          if name in new_model:
-            new_model.pop(name)
-          else:
-            self.warning(
-              f"Equation {name} could not be removed from {model_name}, as it is not part of that block or model.")
-        else:
-          new_model[name] = equations[name]
-      else:
-        raise KeyError(name, " is not a valid equation, block of equations, or model")
-
     for eq in new_model.values():
       replacement_text += eq.name + ", "
     replacement_text = replacement_text[:-2] + "\n/;\n"
 
     #  Define an equation block, so that the model can be used in the same ways a regular blocks
-    self.blocks[model_name] = new_model
+    self.define_block(model_name, new_model)
+    self.track_effect(("block", model_name, new_model))
 
     #  Define a group of all the adjustment variables in model, with the name "Adjust_[model_name]"
     for j in self.adjustment_terms:
       j_group_name = f"{j}_{model_name}"
+      self.track_read("group", j_group_name)
       if j_group_name not in self.groups:
+        self.track_read("group", j)
         self.groups[j_group_name] = {}
         self.groups_conditions[j_group_name] = {}
         for eq in new_model.values():
           j_name = j+eq._name
           self.groups[j_group_name][j_name] = self.groups[j][j_name]
+        self.track_effect(("group", False, j_group_name, self.groups[j_group_name], self.groups_conditions[j_group_name]))
 
     return replacement_text
 
+  def model_equations(self, model_name, content):
+    """Return block of the equations of a model, from the blocks, models, and equations added or removed in content"""
+    item_pattern = re.compile(r"""
+      (?:^|\,)             #  Check only beginning of line or after a comma.
+      \s*                  #  Ignore whitespace
+      (\-)?                #  Optional MINUS character if block or equation is to be removed instead of added ($1)
+      ([^\,\;\s]+)         #  Name of equation ($2)
+    """, re.VERBOSE | re.MULTILINE)
+
+    content = self.remove_comments(content)
+    new_model = Block()
+    for item_match in item_pattern.finditer(content):
+      remove = item_match.group(1)
+      name = item_match.group(2)
+      self.track_read("block", name)
+      if name in self.blocks:
+        if remove:
+          for key in self.blocks[name]:
+            del new_model[key]
+        else:
+          new_model.update(self.blocks[name])
+      elif name in self.equations:
+        if remove:
+          if name in new_model:
+            del new_model[name]
+          else:
+            self.warning(
+              f"Equation {name} could not be removed from {model_name}, as it is not part of that block or model.")
+        else:
+          new_model[name] = self.equation_index[name]
+      else:
+        raise KeyError(name, " is not a valid equation, block of equations, or model")
+    return new_model
+
   def group_define(self, match, text, init_val="0", parameter_group=False):
     """
     Parse $GROUP command
@@ -688,18 +1234,20 @@ class Precompiler:
 
     group_name = match.group(1)
     content = self.remove_comments(match.group(2))
-    replacement_text = ("\n# " + "-"*ceil(50-len(group_name)/2) + group_name + "-"*floor(50-len(group_name)/2) +
+    replacement_text = TextBuffer("\n# " + "-"*ceil(50-len(group_name)/2) + group_name + "-"*floor(50-len(group_name)/2) +
               "\n#  Initialize " + group_name + " group" +
               "\n# " + "-" * 100 +
               "\n$offlisting\n")
 
     new_group = Group()
-    new_group_conditions = CaseInsensitiveDict()
+    new_group_conditions = FoldedDict()
 
     #  Loop over variables and groups to be added or removed from group
     for item in group_variable_pattern.finditer(content):
       remove, name, sets, item_conditions, label, level = item.group(1, 2, 3, 4, 5, 6)
 
+      self.track_read("pgroup" if parameter_group else "group", name)
+      self.track_read("pvariable" if parameter_group else "variable", name)
       if name in GROUPS:
         variables = GROUPS[name].values()
         old_group_conditions = CONDITIONS[name]
@@ -728,7 +1276,8 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
           else:
             remove_conditions = self.combine_conditions(item_conditions, old_group_conditions.get(var.name, None))
             if remove_conditions:
-              new_group_conditions[var.name] = self.combine_conditions(new_group_conditions[var.name], "not " + remove_conditions)
+              new_group_conditions[var.name] = sys.intern(
+                self.combine_conditions(new_group_conditions[var.name], "not " + remove_conditions))
             else:
               new_group.pop(var.name)
               new_group_conditions.pop(var.name)
@@ -747,10 +1296,11 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
           else:
             new_group[var.name] = var, level
 
-          new_group_conditions[var.name] = new_conditions
+          new_group_conditions[var.name] = sys.intern(new_conditions)  # Conditions are shared by many variables and groups
 
     for var, level in new_group.values():
       # Declare the variables if new
+      self.track_read("pvariable" if parameter_group else "variable", var.name)
       if var.name in GROUPS["all"]:
         new_group[var.name] = GROUPS["all"][var.name]
       else:
@@ -769,11 +1319,33 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
     replacement_text += "$onlisting\n"
 
     GROUPS[group_name] = new_group
-    GROUPS["all"] = Group(new_group, **GROUPS["all"])
     CONDITIONS[group_name] = new_group_conditions
-    CONDITIONS["all"] = {k: None for k in GROUPS["all"]}
+    self.merge_all(parameter_group, new_group)
+    self.track_effect(("group", parameter_group, group_name, new_group, new_group_conditions))
+    self.track_effect(("merge_all", parameter_group, new_group))
 
-    return replacement_text
+    return str(replacement_text)
+
+  def merge_all(self, parameter_group, new_group):
+    """
+    Add the variables of a new group to the front of the "all" group, followed by the variables grouped before.
+    The "all" group is a RecencyDict, so the time taken is proportional to the size of the new group.
+    """
+    GROUPS, CONDITIONS = (self.pgroups, self.pgroups_conditions) if parameter_group else (self.groups, self.groups_conditions)
+    if not isinstance(GROUPS["all"], RecencyDict):  # Savepoints of earlier versions of gamY store a regular group
+      GROUPS["all"] = RecencyDict(GROUPS["all"])
+    if not isinstance(CONDITIONS["all"], RecencyDict):
+      CONDITIONS["all"] = RecencyDict(CONDITIONS["all"])
+    if not GROUPS["all"].starts_with(new_group):
+      kind = "pvariable" if parameter_group else "variable"
+      for name in new_group:
+        if name not in GROUPS["all"]:
+          self.changed((kind, name.lower()))
+      self.changed(("pgroup" if parameter_group else "group", "all"))
+    GROUPS["all"].merge(new_group)
+    CONDITIONS["all"].merge(dict.fromkeys(new_group))
+    if len(CONDITIONS["all"]) != len(GROUPS["all"]):  # Variables added to the "all" group directly, e.g. adjustment terms
+      CONDITIONS["all"] = RecencyDict(dict.fromkeys(GROUPS["all"]))
 
   def pgroup_define(self, match, text):
     return self.group_define(match, text, parameter_group=True)
@@ -793,9 +1365,10 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
     id_, name, args, expression = match.groups()
     if not id_:
       id_ = " "
-    if f"$FUNCTION{id_}" in expression:
+    if f"$FUNCTION{id_}" in self.remove_comments(expression):
       self.error(f"Nested FUNCTION definitions must be identified with id numbers (e.g. $FUNCTION1 .. $ENDFUNCTION1): {match.groups()[:-1]}")
     self.user_functions[name] = Function(name, args, expression)
+    self.track_effect(("function", name, self.user_functions[name]))
     replacement_text = (
       "\n# " + "-"*100 +
       "\n#  Define function: " + name  +
@@ -824,26 +1397,34 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
       $ENDFOR1
     $ENDFOR
     """
+    return "".join(self.for_loop_iterations(match))
+
+  def for_loop_iterations(self, match):
+    """
+    Yield the body of a $FOR command once for each iteration, with the iterators replaced by the values of the iteration.
+    Only the copy of the body for each iteration is substituted, so the time is linear in the number of iterations.
+    The token engine evaluates the iterations straight into the output buffer in chunks, without joining all of them first.
+    """
     id_ = match.group(1)
     if not id_:
         id_ = " "
     iterators = self.parse(match.group(2)).replace(" ", "").split(",")
     iterable = self.parse(match.group(3))
     expression = match.group(4)
-    replacement_text = ""
-    if f"$FOR{id_}" in expression:
-      self.error(f"Nested FOR loops must be identified with id numbers (e.g. $FOR1 .. $ENDFOR1): {match.groups()[:-1]}")
+    if f"$FOR{id_}" in self.remove_comments(expression):
+      self.error(f"Nested FOR loops must be identified with id numbers (e.g. $FOR1 .. $ENDFOR1): {(match.group(1), match.group(2), match.group(3))}")
     try:
-      for i in eval(iterable):
-        replacement_text += expression
-        if len(iterators) == 1:
-          replacement_text = replacement_text.replace(iterators[0], str(i))
-        else:
-          for index, iterator in enumerate(iterators):
-            replacement_text = replacement_text.replace(iterator, str(i[index]))
+      values = eval(iterable)
     except SyntaxError:
       self.error(f"Failed to evalute: {iterable}""\n It is not a proper iterable.")
-    return replacement_text
+    for i in values:
+      if len(iterators) == 1:
+        yield expression.replace(iterators[0], str(i))
+      else:
+        body = expression
+        for index, iterator in enumerate(iterators):
+          body = body.replace(iterator, str(i[index]))
+        yield body
 
   def loop(self, match, text):
     """
@@ -876,13 +1457,15 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
     iterable_name = self.parse(match.group(2))  #  Name of group or block to be iterated over
     expression = match.group(3)  # Inside of loop
     # expression = self.round_parentheses(expression)
-    if f"$LOOP{id_}" in expression:
+    if f"$LOOP{id_}" in self.remove_comments(expression):
       self.error(f"Nested loops must be identified with id numbers (e.g. $LOOP1 .. $ENDLOOP1): {match.groups()[:-1]}")
 
-    replacement_text = ("\n# " + "-"*100 +
+    replacement_text = TextBuffer("\n# " + "-"*100 +
               "\n#  Loop over " + iterable_name +
               "\n# " + "-" * 100 + "\n")
 
+    for kind in ("group", "pgroup", "block", "variable"):
+      self.track_read(kind, iterable_name)
     if iterable_name in self.groups:
       replacement_text += self.loop_over_variables(
         expression,
@@ -902,104 +1485,34 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
       replacement_text += self.loop_over_variables(expression, [self.groups["all"][iterable_name]], {iterable_name: None})
     elif iterable_name in self.equations:
       #  If looping over a single equation, we put it in a list to be iterable
-      replacement_text += self.loop_over_equations(expression, [self.equations[iterable_name]])
+      replacement_text += self.loop_over_equations(expression, [self.equation_index[iterable_name]])
     else:
       self.error('"{}" is not a block, group, or variable and cannot be looped over.'.format(iterable_name))
 
-    return replacement_text
+    return str(replacement_text)
 
   def loop_over_variables(self, expression, variables, group_conditions):
     """
     Loop over the variables in a group (used by $LOOP command)
+    The loop body is compiled once into a template and rendered for all the variables at once (see templates.py).
     """
-
-    iter_patterns = {
-      "name": re.compile(r"{NAME}", re.IGNORECASE),
-      "sets": re.compile(r"{SETS?}?(\{\$\}\[[^$=\n;{}]+\])?", re.IGNORECASE),
-      "conditions": re.compile(r"{(SUBSET|CONDITION)S?}", re.IGNORECASE),  # "SUBSETS" will be depreciated
-      "text": re.compile(r"{text}", re.IGNORECASE),
-    }
-
-    replacement_text = ""
-    for variable in variables:
-      sub = expression
-
-      # Replace sets
-      while iter_patterns["sets"].search(sub):
-        filter = iter_patterns["sets"].search(sub).group(1)
-        if filter:
-          sets = variable.sets[1:-1].replace(" ", "").split(",")  # Remove parentheses and whitespace and splits sets into list
-          add_sets, subtract_sets, replace_sets = [], [], []
-          for f in filter[4:-1].replace(" ", "").split(","):
-            if f[0] == "+":
-              add_sets.append(f[1:])
-            elif f[0] == "-":
-              subtract_sets.append(f[1:])
-            else:
-              replace_sets.append(f)
-
-          filtered_sets = sets + add_sets
-          for s in sets:
-            for f in add_sets:
-              if f"[{f}]" in s:  # If the variable's set is a subset of the add set, or if the add set is already present, don't add it
-                pass
-              elif "[{}]".format(s) in f:
-                filtered_sets.remove(s)
-
-            for f in subtract_sets:
-              if s == f or "[{}]".format(f) in s:  # If the variable's sets is a subset of the filter set, the set should be removed
-                filtered_sets.remove(s)
-
-            for f in replace_sets:
-              if "<{}>".format(s) in f:  # Replace set surrounded by < > with the filter
-                filtered_sets[filtered_sets.index(s)] = f.replace("<{}>".format(s), "")
-              elif "[{}]".format(s) in f:
-                filtered_sets.remove(s)
-                filtered_sets.append(f)
-
-          sets = []
-          for s in filtered_sets:
-            if s != "" and s not in sets:
-              sets.append(s)
-          sets = "[" + ",".join(sets) + "]"
-          if sets == "[]":
-            sets = ""
-          sub = iter_patterns["sets"].sub(sets, sub, count=1)
-        else:
-          sub = iter_patterns["sets"].sub(variable.sets, sub, count=1)
-
-      # Replace name
-      sub = iter_patterns["name"].sub(variable.name, sub)
-
-      # Replace conditions
-      if group_conditions[variable.name]:
-        sub = iter_patterns["conditions"].sub(group_conditions[variable.name], sub)
-      else:
-        sub = iter_patterns["conditions"].sub("(1)", sub)
-
-      # Replace text
-      sub = iter_patterns["text"].sub(variable.label, sub)
-
-      replacement_text += sub
-    return replacement_text
+    variables = list(variables)
+    return compile_template(expression).render({
+      "name": [variable.name for variable in variables],
+      "sets": [variable.sets for variable in variables],
+      "conditions": [group_conditions[variable.name] or "(1)" for variable in variables],
+      "text": [variable.label for variable in variables],
+    })
 
   def loop_over_equations(self, expression, equations):
     """
     Loop over the equations in a block (used by $LOOP command)
     """
-
-    iter_patterns = {
-      "name": re.compile(r"{NAME}", re.IGNORECASE),
-      "sets": re.compile(r"{SETS}?(\{\$\}\[[^=\n;{}]+\])?", re.IGNORECASE),
-      "conditions": re.compile(r"{(SUBSET|CONDITION)S?}", re.IGNORECASE),
-      "LHS": re.compile(r"{LHS}", re.IGNORECASE),
-      "RHS": re.compile(r"{RHS}", re.IGNORECASE)
-    }
-
-    replacement_text = ""
+    equations = list(equations)
     for eq in equations:
       # All equations must have a subset enclosed in parentheses to allow adding to the subset using and/or.
       # A subset of (1) is added if none exists
+      original_conditions = eq.conditions
       if eq.conditions == "":
         eq.conditions = "(1)"
       if eq.conditions[0] == "$":
@@ -1007,57 +1520,12 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
       if eq.conditions[0] != "[":
         eq.conditions = "[" + eq.conditions + "]"
       eq.conditions = eq.conditions
+      if eq.conditions != original_conditions:
+        self.track_effect(("equation_conditions", eq, eq.conditions))
 
-      sub = expression
-
-      # Replace sets
-      while iter_patterns["sets"].search(sub):
-        filter = iter_patterns["sets"].search(sub).group(1)
-        if filter:
-          sets = eq.sets[1:-1].replace(" ", "").split(",")  # Remove parentheses and whitespace and splits sets into list
-          add_sets, subtract_sets, replace_sets = [], [], []
-          for f in filter[4:-1].replace(" ", "").split(","):
-            if f[0] == "+":
-              add_sets.append(f[1:])
-            elif f[0] == "-":
-              subtract_sets.append(f[1:])
-            else:
-              replace_sets.append(f)
-
-          filtered_sets = sets + add_sets
-          for s in sets:
-            for f in add_sets:
-              if "[{}]".format(f) in s:  # If the variable's set is a subset of the add set, or if the add set is already present, don't add it
-                filtered_sets.remove(f)
-              elif "[{}]".format(s) in f:
-                filtered_sets.remove(s)
-
-            for f in subtract_sets:
-              if s == f or "[{}]".format(f) in s:  # If the variable's sets is a subset of the filter set, the set should be removed
-                filtered_sets.remove(s)
-
-            for f in replace_sets:
-              if "<{}>".format(s) in f:  # Replace set surrounded by < > with the filter
-                filtered_sets[filtered_sets.index(s)] = f.replace("<{}>".format(s), "")
-              elif "[{}]".format(s) in f:
-                filtered_sets.remove(s)
-                filtered_sets.append(f)
-
-          sets = []
-          for s in filtered_sets:
-            if s != "" and s not in sets:
-              sets.append(s)
-          sets = "[" + ",".join(sets) + "]"
-          if sets == "[]":
-            sets = ""
-          sub = iter_patterns["sets"].sub(sets, sub, count=1)
-        else:
-          sub = iter_patterns["sets"].sub(eq.sets, sub, count=1)
-
-      for key, pattern in iter_patterns.items():
-        sub = pattern.sub(eq.__dict__[key], sub)
-      replacement_text += sub
-    return replacement_text
+    return compile_template(expression, equations=True).render({
+      key: [getattr(eq, key) for eq in equations] for key in ("name", "sets", "conditions", "LHS", "RHS")
+    })
 
 
   def display(self, match, text, ignore_conditionals=False):
@@ -1066,7 +1534,7 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
     """
     content = match.group(1)
 
-    replacement_text = ""
+    replacement_text = TextBuffer()
     report = []
 
     # We use the group command to define a temporary group.
@@ -1097,7 +1565,7 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
       replacement_text += "display {};\n".format(p_name)
       replacement_text += "Option Clear={};\n".format(p_name)
 
-    return replacement_text
+    return str(replacement_text)
 
   def display_all(self, match, text):
     return self.display(match, text, ignore_conditionals=True)
@@ -1105,12 +1573,38 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
 
   def solve(self, match, text):
     """
+    Parse $SOLVE command.
+    Solve a temporary model of blocks, models, and equations, declared once for each set of equations and model attributes.
+    Syntax example:
+    $SOLVE M_base;
+    $SOLVE(CNS, holdFixed=1, solvelink=5) M_base, -E_myEquation;
     """
-    content = match.group(1)
+    options, content = match.group(1), match.group(2)
+    solve_type, attributes = "CNS", []
+    for option in (options or "").split(","):
+      option = option.strip()
+      if "=" in option:
+        attribute, value = option.split("=", 1)
+        attributes.append((attribute.strip(), value.strip()))
+      elif option:
+        solve_type = option
+
+    new_model = self.model_equations("$SOLVE", content)
+    key = fingerprint((sorted(name.lower() for name in new_model), [(a.lower(), v) for a, v in attributes]))
+    self.track_read("temp_model", key)
+    if key in self.temp_models:  # The same model has been declared by an earlier $SOLVE
+      return "Solve {} using {};".format(self.temp_models[key], solve_type)
+
+    self.track_read("model_counter")
     model_name = "temp_model_{}".format(self.model_counter)
     self.model_counter += 1
-    replacement_text = self.model_define(MockMatch(model_name, content), text)
-    replacement_text += "Solve {} using CNS;".format(model_name)
+    self.track_effect(("model_counter", self.model_counter))
+    self.temp_models[key] = model_name
+    self.track_effect(("temp_model", key, model_name))
+    replacement_text = self.declare_model(model_name, new_model)
+    for attribute, value in attributes:
+      replacement_text += "{}.{} = {};\n".format(model_name, attribute, value)
+    replacement_text += "Solve {} using {};".format(model_name, solve_type)
     return replacement_text
 
 
@@ -1128,6 +1622,34 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
       $FIX(0) J;  #  Set all J terms to 0
       $UNFIX(0, inf) G_prices;  #  Unfix group and set lower bound to zero
     """
+    operations = self.fix_unfix_operations(match, text, lower_bound, upper_bound, level_value)
+    return (
+      self.fix_unfix_banner(match) + "$offlisting\n" +
+      "".join(operation.text(operation.conditions) for operation in operations) +
+      "$onlisting\n"
+    )
+
+  def fix_unfix_run(self, texts):
+    """
+    Return string with consecutive FIX and UNFIX commands replaced by GAMS code,
+    with only the net bound operations of each variable (see coalesce.py).
+    """
+    banners, operations = [], []
+    for text in texts:
+      match = self.patterns["fix"].fullmatch(text)
+      banners.append(self.fix_unfix_banner(match))
+      operations += self.fix_unfix_operations(match, text)
+    return (
+      "".join(banners) + "$offlisting\n" +
+      "".join(operation.text(conditions) for operation, conditions in net_operations(operations)) +
+      "$onlisting\n"
+    )
+
+  def fix_unfix_banner(self, match):
+    return "\n# " + "-"*100 + self.comment_out(match.group(0)) + "\n# " + "-" * 100 + "\n"
+
+  def fix_unfix_operations(self, match, text, lower_bound="-inf", upper_bound="inf", level_value=None):
+    """Return list of the bound operations of a FIX or UNFIX command on each variable"""
     command = match.group(1).lower()
     bounds = match.group(2)
     content = self.remove_comments(match.group(3))
@@ -1136,33 +1658,21 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
     if command == "$unfix" and bounds:
       lower_bound, upper_bound = bounds.split(",")
 
-    replacement_text = (
-      "\n# " + "-"*100 +
-      self.comment_out(match.group(0)) +
-      "\n# " + "-" * 100 +
-      "\n$offlisting\n"
-    )
-
     # We use the group command to define a temporary group.
     # This ensures that the syntax for FIX/UNFIX is identical to the GROUP command.
     self.group_define(MockMatch("temp_fix_unfix_group", content), text)
 
+    operations = []
     for var in self.groups["temp_fix_unfix_group"].values():
       conditions = self.groups_conditions["temp_fix_unfix_group"][var.name]
-      if conditions:
-        conditions = "$"+conditions
-
       if (command == "$fix"):
         if level_value:
-          replacement_text += "{var.name}.FX{var.sets}{conditions} = {level_value};\n".format(**locals())
+          operations.append(BoundOperation(var, conditions, [("FX", level_value)], sets_level=True))
         else:
-          replacement_text += "{var.name}.FX{var.sets}{conditions} = {var.name}.L{var.sets};\n".format(**locals())
+          operations.append(BoundOperation(var, conditions, [("FX", f"{var.name}.L{var.sets}")]))
       elif command == "$unfix":
-        replacement_text += "{var.name}.lo{var.sets}{conditions} = {lower_bound};\n".format(**locals())
-        replacement_text += "{var.name}.up{var.sets}{conditions} = {upper_bound};\n".format(**locals())
-
-    replacement_text += "$onlisting\n"
-    return replacement_text
+        operations.append(BoundOperation(var, conditions, [("lo", lower_bound), ("up", upper_bound)]))
+    return operations
 
 
   @staticmethod
@@ -1172,52 +1682,32 @@ Error in {group_name}: {name}{sets}{item_conditions}""")
 
   @staticmethod
   def combine_conditions(*args, intersect=True):
-    """Combine multiple conditions such that '$t0[t]' and '$a0[t]' becomes '$((t0[t]) and (a0[t]))' """
-
-    #  Create list of non-empty conditions
-    conditions = []
-    for subset in args:
-      if subset:
-        subset = subset.replace("$", "", 1)
-        if subset not in conditions:
-          conditions.append(subset)
-      elif not intersect:
-        return ""  # Combining an empty condition using OR removes all conditions
-
-    if not conditions:
-      return ""
-    elif intersect:
-      combined = " and ".join(conditions)
-    else:
-      combined = " or ".join(conditions)
-    if is_enclosed(combined):
-      return combined
-    else:
-      return "({})".format(combined)
-
-def is_enclosed(expression):
-  """
-  Check if the the expression is enclosed in brackets
-  >>> is_enclosed('(foo)(bar)')
-  False
-  >>> is_enclosed('((foo)(bar))')
-  True
-  >>> is_enclosed('[[foo]{bar}]')
-  True
-  """
-  brackets = ["()", "[]", "{}"]
-  if expression[0] + expression[-1] not in brackets:
-    return False
-  for br in brackets:
-    open_count = 0
-    for char in expression[1:-1]:
-      if char == br[0]:
-        open_count += 1
-      if char == br[1]:
-        open_count -= 1
-      if open_count < 0:
-        return False
-  return True
+    """Combine multiple conditions such that '$t0[t]' and '$a0[t]' becomes '(t0[t] and a0[t])', simplifying the result (see conditions.py)"""
+    return conditions.combine(args, intersect)
+
+
+#  Command line options which switch on a feature of gamY, and the keyword argument of the Precompiler they set
+FLAG_OPTIONS = {
+  "--profile": "profile",
+  "--import_cache": "import_cache",
+  "--skip_unchanged": "skip_unchanged",  # Handled by cmd_call and py_call (see manifest.py)
+  "--delta_savepoints": "delta_savepoints",
+  "--lean": "lean",
+  "--dedupe": "dedupe",
+  "--coalesce_fix": "coalesce_fix",
+}
+
+
+def is_gamY_option(arg):
+  """Return True if the command line argument is only used by gamY, and should not be passed on to GAMS"""
+  arg = arg.lower()
+  return arg[:5] == "gams=" or arg[:9] == "--engine=" or arg in FLAG_OPTIONS
+
+
+def flag_options(args):
+  """Return dict of keyword arguments, which are True if the corresponding option in FLAG_OPTIONS is used"""
+  used = {arg.lower() for arg in args}
+  return {name: option in used for option, name in FLAG_OPTIONS.items()}
 
 
 def cmd_call():
@@ -1230,19 +1720,29 @@ def cmd_call():
   else:
     file_path = args[1]
 
-  precompiler = Precompiler(file_path, add_adjust=None, mult_adjust=None)
+  options = flag_options(args)
+  skip_unchanged = options.pop("skip_unchanged")
+  precompiler = Precompiler(file_path, add_adjust=None, mult_adjust=None, **options)
 
   # Read optional command line arguments
-  save_file, gams_path = None, None
+  read_files, save_file, gams_path = [], None, None
   for arg in args:
     #  Read blocks, groups, and variables from saved file if the r=<file_path> option is used.
     if arg[:2] == "r=":
-      precompiler.read(arg[2:])
+      read_files.append(arg[2:])
 
     #  Save definitions if s=<file_path> is used
     elif arg[:2] == "s=":
       save_file = arg[2:]
 
+    #  Select the parsing engine if --engine=<regex|token> is used
+    elif arg[:9].lower() == "--engine=":
+      precompiler.engine = arg[9:].lower()
+
+    #  The options in FLAG_OPTIONS are switched on before reading the arguments
+    elif arg.lower() in FLAG_OPTIONS:
+      continue
+
     #  Transfer command line parameters to data structure
     elif arg[:2] == "--":
       assert "=" in arg[2:], f"'{arg}' command line parameter starts with '--' but does not contain a '=' symbol."
@@ -1270,19 +1770,51 @@ def cmd_call():
     if gams_path[-4:] != ".exe":
       sys.exit("ERROR: " + gams_path + " is not an executable file. Make sure GAMS path is correctly set.")
 
-  #  Parse file using recursive descent
-  text = precompiler()
-
-  if save_file: # Save gamY data structure if gamY is called with s= argument
-    precompiler.save(save_file)
-
-  #  Save pre-compiled GAMS file in 'Expanded' folder
   expanded_dir = os.path.join(precompiler.file_dir, "Expanded")
-  if not os.path.exists(expanded_dir):
-    os.makedirs(expanded_dir)
   new_file = os.path.join(expanded_dir, precompiler.file_name.replace(".gms", ".gmy"))
-  with open(new_file, 'w') as f:
-    f.write(text)
+
+  #  Reuse the expanded file and savepoint if --skip_unchanged is used and nothing has changed since they were written
+  manifest = None
+  if skip_unchanged:
+    manifest = Manifest(
+      new_file, precompiler.file_path,
+      [arg for arg in args[2:] if arg[:5].lower() != "gams=" and arg.lower() != "--skip_unchanged"],
+      [os.path.join(precompiler.file_dir, read_file) + ".pkl" for read_file in read_files],
+      os.path.join(precompiler.file_dir, save_file) + ".pkl" if save_file else None,
+    )
+  if manifest and manifest.is_up_to_date():
+    print(f"gamY cache hit: {new_file} is unchanged, the precompiler was skipped")
+  else:
+    for read_file in read_files:
+      precompiler.read(read_file)
+
+    #  Parse file using recursive descent, and save pre-compiled GAMS file in 'Expanded' folder
+    if not os.path.exists(expanded_dir):
+      os.makedirs(expanded_dir)
+    precompiler.write(new_file)
+    if precompiler.lean_filter:
+      print(precompiler.lean_filter.report())
+    if precompiler.deduplicator:
+      print(precompiler.deduplicator.report())
+
+    if save_file: # Save gamY data structure if gamY is called with s= argument
+      precompiler.save(save_file)
+
+    if precompiler.import_cache:
+      print(f"Import cache: {precompiler.import_cache.hits} hits, {precompiler.import_cache.misses} misses")
+    if precompiler.memo.hits:
+      print(f"Memoized expansions: {precompiler.memo.hits} hits, {precompiler.memo.misses} misses")
+
+    if precompiler.profiler: # Write profile next to the LST file if gamY is called with --profile
+      profile_path = os.path.splitext(precompiler.list_file_path)[0]
+      precompiler.profiler.save(profile_path)
+      print("Precompiler profile: " + profile_path + ".profile.txt")
+
+    if manifest:
+      manifest.save(
+        [name for kind, name in precompiler.inputs if kind == "file"],
+        [name for kind, name in precompiler.inputs if kind == "env"],
+      )
 
   compilation_time = timer() - start_time
 
@@ -1297,21 +1829,26 @@ def cmd_call():
     "pageSize=0",
     "pageWidth=9999",
   ]
-  call_parameters += [arg for arg in args[2:] if (arg[:5] != "gams=")]
+  call_parameters += [arg for arg in args[2:] if not is_gamY_option(arg)]
   process = subprocess.Popen(
     [gams_path, new_file, *call_parameters],
     stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
     universal_newlines=True, shell=True
   )
 
+  gams_compile_time = None
   while process.poll() is None:
     for line in iter(process.stdout.readline, ""):
       if not (line[:3] == "---" and prev_line[:10] == line[:10]):  # For almost identical lines, only print the last one
         sys.stdout.write(prev_line)
         sys.stdout.flush()
+      if gams_compile_time is None:
+        gams_compile_time = lean.compile_time(line)
       prev_line = line
   sys.stdout.write(prev_line)
   sys.stdout.flush()
+  if gams_compile_time is not None:
+    print(lean.report_compile_time(new_file, precompiler.lean, gams_compile_time))
 
 #  Print errors and messages from listing file (lines starting with ****)
   error_pattern = re.compile(r"^(\*{4}.+)", re.MULTILINE)
@@ -1341,19 +1878,29 @@ def py_call(args):
   else:
     file_path = args[1]
 
-  precompiler = Precompiler(file_path, add_adjust=None, mult_adjust=None)
+  options = flag_options(args)
+  skip_unchanged = options.pop("skip_unchanged")
+  precompiler = Precompiler(file_path, add_adjust=None, mult_adjust=None, **options)
 
   # Read optional command line arguments
-  save_file, gams_path = None, None
+  read_files, save_file, gams_path = [], None, None
   for arg in args:
     #  Read blocks, groups, and variables from saved file if the r=<file_path> option is used.
     if arg[:2] == "r=":
-      precompiler.read(arg[2:])
+      read_files.append(arg[2:])
 
     #  Save definitions if s=<file_path> is used
     elif arg[:2] == "s=":
       save_file = arg[2:]
 
+    #  Select the parsing engine if --engine=<regex|token> is used
+    elif arg[:9].lower() == "--engine=":
+      precompiler.engine = arg[9:].lower()
+
+    #  The options in FLAG_OPTIONS are switched on before reading the arguments
+    elif arg.lower() in FLAG_OPTIONS:
+      continue
+
     #  Transfer command line parameters to data structure
     elif arg[:2] == "--":
       assert "=" in arg[2:], f"'{arg}' command line parameter starts with '--' but does not contain a '=' symbol."
@@ -1381,19 +1928,51 @@ def py_call(args):
     if gams_path[-4:] != ".exe":
       sys.exit("ERROR: " + gams_path + " is not an executable file. Make sure GAMS path is correctly set.")
 
-  #  Parse file using recursive descent
-  text = precompiler()
-
-  if save_file: # Save gamY data structure if gamY is called with s= argument
-    precompiler.save(save_file)
-
-  #  Save pre-compiled GAMS file in 'Expanded' folder
   expanded_dir = os.path.join(precompiler.file_dir, "Expanded")
-  if not os.path.exists(expanded_dir):
-    os.makedirs(expanded_dir)
   new_file = os.path.join(expanded_dir, precompiler.file_name.replace(".gms", ".gmy"))
-  with open(new_file, 'w') as f:
-    f.write(text)
+
+  #  Reuse the expanded file and savepoint if --skip_unchanged is used and nothing has changed since they were written
+  manifest = None
+  if skip_unchanged:
+    manifest = Manifest(
+      new_file, precompiler.file_path,
+      [arg for arg in args[2:] if arg[:5].lower() != "gams=" and arg.lower() != "--skip_unchanged"],
+      [os.path.join(precompiler.file_dir, read_file) + ".pkl" for read_file in read_files],
+      os.path.join(precompiler.file_dir, save_file) + ".pkl" if save_file else None,
+    )
+  if manifest and manifest.is_up_to_date():
+    print(f"gamY cache hit: {new_file} is unchanged, the precompiler was skipped")
+  else:
+    for read_file in read_files:
+      precompiler.read(read_file)
+
+    #  Parse file using recursive descent, and save pre-compiled GAMS file in 'Expanded' folder
+    if not os.path.exists(expanded_dir):
+      os.makedirs(expanded_dir)
+    precompiler.write(new_file)
+    if precompiler.lean_filter:
+      print(precompiler.lean_filter.report())
+    if precompiler.deduplicator:
+      print(precompiler.deduplicator.report())
+
+    if save_file: # Save gamY data structure if gamY is called with s= argument
+      precompiler.save(save_file)
+
+    if precompiler.import_cache:
+      print(f"Import cache: {precompiler.import_cache.hits} hits, {precompiler.import_cache.misses} misses")
+    if precompiler.memo.hits:
+      print(f"Memoized expansions: {precompiler.memo.hits} hits, {precompiler.memo.misses} misses")
+
+    if precompiler.profiler: # Write profile next to the LST file if gamY is called with --profile
+      profile_path = os.path.splitext(precompiler.list_file_path)[0]
+      precompiler.profiler.save(profile_path)
+      print("Precompiler profile: " + profile_path + ".profile.txt")
+
+    if manifest:
+      manifest.save(
+        [name for kind, name in precompiler.inputs if kind == "file"],
+        [name for kind, name in precompiler.inputs if kind == "env"],
+      )
 
   compilation_time = timer() - start_time
 
@@ -1408,21 +1987,26 @@ def py_call(args):
     "pageSize=0",
     "pageWidth=9999",
   ]
-  call_parameters += [arg for arg in args[2:] if (arg[:5] != "gams=")]
+  call_parameters += [arg for arg in args[2:] if not is_gamY_option(arg)]
   process = subprocess.Popen(
     [gams_path, new_file, *call_parameters],
     stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
     universal_newlines=True, shell=False
   )
 
+  gams_compile_time = None
   while process.poll() is None:
     for line in iter(process.stdout.readline, ""):
       if not (line[:3] == "---" and prev_line[:10] == line[:10]):  # For almost identical lines, only print the last one
         sys.stdout.write(prev_line)
         sys.stdout.flush()
+      if gams_compile_time is None:
+        gams_compile_time = lean.compile_time(line)
       prev_line = line
   sys.stdout.write(prev_line)
   sys.stdout.flush()
+  if gams_compile_time is not None:
+    print(lean.report_compile_time(new_file, precompiler.lean, gams_compile_time))
 
 #  Print errors and messages from listing file (lines starting with ****)
   error_pattern = re.compile(r"^(\*{4}.+)", re.MULTILINE)
@@ -0,0 +1,83 @@
+"""
+Evaluation of the conditions of $IF commands, used by Precompiler.if_statements.
+A condition is normalized from GAMS to python syntax in a single pass, e.g. '=' and 'EQ' become '==', and '<>' becomes '!=',
+and is lowercased, as nothing is case sensitive.
+The normalized condition is parsed, checked, and compiled once, and the truth value is cached by the text of the condition:
+the same conditions, e.g. '"variables" == "exogenous_values"', are evaluated for each module in every stage.
+Conditions can only contain literals (strings, numbers, lists, and tuples), comparisons, addition, subtraction, division,
+and logical operators, so they are evaluated without access to any names or functions.
+Multiplication and powers are not allowed, as they can build huge numbers or strings from short literals, e.g. '9**9**9**9'.
+"""
+import ast
+import re
+from functools import lru_cache
+
+#  GAMS operators and their python equivalent
+OPERATOR_PATTERN = re.compile(r"""
+  (?<![=><!])=(?![=><!])
+  |<>
+  |(?<![a-zA-Z])(EQ|NE|LT|GT|LE|GE)(?![a-zA-Z])
+""", re.IGNORECASE | re.VERBOSE)
+OPERATORS = {"=": "==", "<>": "!=", "eq": "==", "ne": "!=", "lt": "<", "gt": ">", "le": "<=", "ge": ">="}
+
+#  Syntax allowed in conditions
+ALLOWED_NODES = (
+  ast.Expression, ast.Constant, ast.Tuple, ast.List, ast.Load,
+  ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd, ast.IfExp,
+  ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+  ast.BinOp, ast.Add, ast.Sub, ast.Div,
+)
+CACHE_SIZE = 4096  # Number of distinct conditions compiled and evaluated that are kept
+
+
+def normalize(condition):
+  """
+  Return condition in python syntax, e.g. '%stage% EQ "equations"' with the stage substituted becomes '"x" == "equations"'
+
+  >>> normalize('"exogenous_values" EQ "equations" or 2 ge 1')
+  '"exogenous_values" == "equations" or 2 >= 1'
+  >>> normalize('1 = 1 and 2 <> 3 and 4 >= 4 and 5 != 6')
+  '1 == 1 and 2 != 3 and 4 >= 4 and 5 != 6'
+  """
+  return OPERATOR_PATTERN.sub(lambda match: OPERATORS[match.group(0).lower()], condition)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_condition(condition):
+  """
+  Return code object of a normalized condition, raising ValueError if it uses anything but literals and operators
+
+  >>> compile_condition('x == 1')
+  Traceback (most recent call last):
+  ValueError: Name is not allowed in a condition: x == 1
+  >>> compile_condition('__import__("os").getcwd()')
+  Traceback (most recent call last):
+  ValueError: Call is not allowed in a condition: __import__("os").getcwd()
+  >>> compile_condition('"a".upper() == "A"')
+  Traceback (most recent call last):
+  ValueError: Call is not allowed in a condition: "a".upper() == "a"
+  >>> compile_condition('9**9**9**9')
+  Traceback (most recent call last):
+  ValueError: Pow is not allowed in a condition: 9**9**9**9
+  """
+  text = condition.lower()
+  tree = ast.parse(text.strip(), mode="eval")
+  for node in ast.walk(tree):
+    if not isinstance(node, ALLOWED_NODES):
+      raise ValueError(f"{type(node).__name__} is not allowed in a condition: {text}")
+  return compile(tree, "<$IF condition>", "eval")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def evaluate(condition):
+  """
+  Return truth value of a normalized condition
+
+  >>> evaluate(normalize('"EQUATIONS" EQ "equations"'))
+  True
+  >>> evaluate('2015 in [2015, 2016] and not (1 + 1 > 2 or "a" == "b")')
+  True
+  >>> evaluate('0')
+  False
+  """
+  return bool(eval(compile_condition(condition), {"__builtins__": {}}, {}))
@@ -0,0 +1,147 @@
+"""
+On-disk cache of parsed $IMPORT files, used with the --import_cache option.
+Files such as the model modules are imported again in every stage of the model, with a different %stage%.
+Each parsed import is stored under a key made from the path and content of the file (and the precompiler settings),
+together with
+  the dependencies: a fingerprint of each part of the precompiler state the import read
+    (environment variables, groups, variables, blocks, user functions, and nested imported files),
+  the effects: the changes the import made to the state (definitions of groups, blocks, functions, and environment variables),
+  and the parsed text.
+When a file is imported again, an entry whose dependencies match the current state is reused by replaying its effects,
+instead of parsing the file.
+
+Variables and equations that existed before the import are shared by the groups and blocks the import defines,
+and can be changed in place (e.g. the conditions of equations looped over).
+The effects therefore store such objects as references to where they were read, e.g. ("block", <block name>, <equation name>),
+which are resolved to the objects in the current state when the effects are replayed.
+"""
+import glob
+import hashlib
+import io
+import os
+import pickle
+
+CACHE_VERSION = 1
+MAX_ENTRIES = 16  # Number of entries kept for each file, e.g. one for each stage the file is imported in
+
+
+def fingerprint(value):
+  """Return hash of a picklable value, or None if the value is None"""
+  if value is None:
+    return None
+  buffer = io.BytesIO()
+  pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+  pickler.fast = True  # Without the memo, equal values are pickled identically, regardless of which objects they share
+  pickler.dump(value)
+  return hashlib.sha1(buffer.getvalue()).hexdigest()
+
+
+def source_fingerprint():
+  """
+  Return hash of the source code of the precompiler, i.e. every python file in the gamY folder.
+  Used by the import cache and the manifest of --skip_unchanged, which are invalidated when any of the files change.
+  """
+  sha = hashlib.sha1(str(CACHE_VERSION).encode())
+  source_dir = os.path.dirname(os.path.abspath(__file__))
+  for path in sorted(glob.glob(os.path.join(source_dir, "*.py"))):
+    sha.update(os.path.basename(path).encode())
+    with open(path, "rb") as f:
+      sha.update(f.read())
+  return sha.hexdigest()
+
+
+class EffectPickler(pickle.Pickler):
+  """Pickler storing objects that existed before the import as references to where they were read"""
+
+  def __init__(self, file, external):
+    super().__init__(file, pickle.HIGHEST_PROTOCOL)
+    self.external = external
+
+  def persistent_id(self, obj):
+    if id(obj) in self.external:
+      return self.external[id(obj)][1]
+    return None
+
+
+class EffectUnpickler(pickle.Unpickler):
+  """Unpickler resolving references to objects in the current state"""
+
+  def __init__(self, file, resolve):
+    super().__init__(file)
+    self.resolve = resolve
+
+  def persistent_load(self, location):
+    return self.resolve(location)
+
+
+def dump_effects(effects, external):
+  buffer = io.BytesIO()
+  EffectPickler(buffer, external).dump(effects)
+  return buffer.getvalue()
+
+
+def load_effects(data, resolve):
+  return EffectUnpickler(io.BytesIO(data), resolve).load()
+
+
+class ImportRecorder:
+  """Dependencies and effects recorded while parsing an imported file"""
+  __slots__ = ("dependencies", "written", "effects", "external")
+
+  def __init__(self):
+    self.dependencies = {}  # Maps (kind, name) to the fingerprint of the state read
+    self.written = set()  # (kind, name) of the state written. Reading these afterwards is not a dependency.
+    self.effects = []
+    self.external = {}  # Maps id of objects read to (object, location)
+
+  def read(self, key, value_fingerprint, objects):
+    self.dependencies[key] = value_fingerprint
+    for location, obj in objects:
+      if id(obj) not in self.external:
+        self.external[id(obj)] = (obj, location)
+
+  def needs(self, key):
+    """Return True if reading the state is a new dependency"""
+    return key not in self.dependencies and key not in self.written
+
+  def write(self, keys, effect):
+    self.written.update(keys)
+    self.effects.append(effect)
+
+
+class ImportCache:
+  """
+  Directory of pickle files, one for each imported file content,
+  each holding a list of (dependencies, pickled effects, text) entries, most recent first.
+  """
+
+  def __init__(self, directory, settings):
+    self.directory = directory
+    self.settings = source_fingerprint() + repr(settings)
+    self.hits = 0
+    self.misses = 0
+
+  def key(self, file_path, text, engine):
+    sha = hashlib.sha1((self.settings + engine).encode())
+    sha.update(os.path.normcase(file_path).encode())
+    sha.update(text.encode())
+    return sha.hexdigest()
+
+  def path(self, key):
+    return os.path.join(self.directory, key + ".pkl")
+
+  def load(self, key):
+    try:
+      with open(self.path(key), "rb") as f:
+        return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+      return []
+
+  def store(self, key, entry):
+    entries = [entry] + self.load(key)[:MAX_ENTRIES - 1]
+    if not os.path.exists(self.directory):
+      os.makedirs(self.directory)
+    temp_path = self.path(key) + f".{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+      pickle.dump(entries, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, self.path(key))
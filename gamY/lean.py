@@ -0,0 +1,123 @@
+"""
+Lean output of the expanded file, used with the --lean option.
+The expanded file is filtered line by line, after dollar commands have been dedented:
+  comment lines ('#' comments, '*' comments in the first column, and $ONTEXT .. $OFFTEXT blocks) are dropped,
+  including the banners written around imports, loops, groups, and $IF commands, and the stubs of false $IF branches,
+  blank lines are dropped and trailing whitespace is removed (indentation is kept, as GAMS tables are aligned by column),
+  and $ONLISTING / $OFFLISTING toggles which have no effect are dropped:
+    a toggle is only written before the next line which is kept, if the listing is not already in the requested state,
+    e.g. $ONLISTING directly followed by $OFFLISTING, as written between consecutive $FIX commands, is dropped.
+Lines inside $ONECHO, $ONPUT, and $ONEMBEDDEDCODE blocks are written unchanged.
+The state of the listing is unknown after an $INCLUDE or $BATINCLUDE, so the next toggle is always written.
+The filter can be fed the text in chunks of any size, as an incomplete last line is held back until the next chunk.
+
+The GAMS compilation time of the expanded file is stored next to it, for the lean and the full output,
+so that the reduction can be reported once both have been run.
+"""
+import json
+import os
+import re
+
+#  Blocks written unchanged, and the command ending them
+VERBATIM_BLOCKS = (("$onecho", "$offecho"), ("$onput", "$offput"), ("$onembeddedcode", "$offembeddedcode"))
+
+#  Line of the GAMS log written when compilation has finished
+COMPILE_TIME_PATTERN = re.compile(r"--- Starting execution: elapsed (\d+):(\d+):(\d+(?:\.\d*)?)")
+
+
+class LeanFilter:
+  """Callable filter of the expanded text, returning the lean text of the complete lines received"""
+  __slots__ = ("partial", "verbatim_end", "comment_block", "listing", "requested_listing", "input_size", "output_size")
+
+  def __init__(self, listing=True):
+    self.partial = ""  # Incomplete last line of the text received so far
+    self.verbatim_end = None  # Command ending the verbatim block the filter is in, e.g. "$offecho"
+    self.comment_block = False  # Inside $ONTEXT .. $OFFTEXT
+    self.listing = listing  # Listing is switched on by default in GAMS, None if the state is not known, e.g. in an included file
+    self.requested_listing = listing  # State requested by the last toggle, which is written before the next line kept
+    self.input_size = 0
+    self.output_size = 0
+
+  def __call__(self, text):
+    self.input_size += len(text)
+    lines = (self.partial + text).split("\n")
+    self.partial = lines.pop()
+    return self.filter(lines)
+
+  def close(self):
+    """Return the lean text of the last line, and the last toggle if the listing is not in the requested state"""
+    lines, self.partial = [self.partial], ""
+    return self.filter(lines, final=True)
+
+  def filter(self, lines, final=False):
+    kept = []
+    for line in lines:
+      if self.verbatim_end:
+        kept.append(line)
+        if line.strip().lower().startswith(self.verbatim_end):
+          self.verbatim_end = None
+        continue
+      line = line.rstrip()
+      lower = line.lstrip().lower()
+      if self.comment_block:
+        self.comment_block = not lower.startswith("$offtext")
+        continue
+      if not lower or lower[0] == "#" or line[0] == "*":
+        continue
+      if lower.startswith("$ontext"):
+        self.comment_block = True
+        continue
+      if lower in ("$onlisting", "$offlisting"):
+        self.requested_listing = lower == "$onlisting"
+        continue
+      if self.listing != self.requested_listing:
+        kept.append("$onlisting" if self.requested_listing else "$offlisting")
+        self.listing = self.requested_listing
+      for start, end in VERBATIM_BLOCKS:
+        if lower.startswith(start):
+          self.verbatim_end = end
+      kept.append(line)
+      if lower.startswith(("$include", "$batinclude")):
+        self.listing = None  # The included file can toggle the listing
+    if final and self.listing != self.requested_listing:
+      kept.append("$onlisting" if self.requested_listing else "$offlisting")
+      self.listing = self.requested_listing
+    if not kept:
+      return ""
+    text = "\n".join(kept) + "\n"
+    self.output_size += len(text)
+    return text
+
+  def report(self):
+    reduction = 1 - self.output_size / self.input_size if self.input_size else 0
+    return f"Lean output: {self.output_size / 1e6:.2f} MB instead of {self.input_size / 1e6:.2f} MB ({reduction:.0%} smaller)"
+
+
+def compile_time(line):
+  """Return the GAMS compilation time in seconds if line of the GAMS log reports it, otherwise None"""
+  match = COMPILE_TIME_PATTERN.search(line)
+  if match:
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+  return None
+
+
+def report_compile_time(expanded_path, lean, seconds):
+  """
+  Store the GAMS compilation time of the lean or full expanded file next to it,
+  and return a report comparing it with the other output, if that has been compiled before.
+  """
+  path = os.path.splitext(expanded_path)[0] + ".compile_time.json"
+  times = {}
+  if os.path.isfile(path):
+    with open(path) as f:
+      times = json.load(f)
+  mode, other = ("lean", "full") if lean else ("full", "lean")
+  times[mode] = seconds
+  with open(path, "w") as f:
+    json.dump(times, f)
+  text = f"GAMS compilation time: {seconds:.2f} seconds ({mode} output)"
+  if times.get(other):
+    full, lean_time = times["full"], times["lean"]
+    text += f", lean output compiles {1 - lean_time / full:.0%} faster than full output ({lean_time:.2f} vs {full:.2f} seconds)"
+  return text
@@ -0,0 +1,68 @@
+"""
+Fingerprint manifest of an expanded file, used with the --skip_unchanged option.
+The manifest is stored next to the expanded file, as Expanded/<name>.manifest.json, and records hashes of
+  the gamY source code, the command line arguments, and the savepoints read (r=),
+  the source file and the files it imported (also imports of imports),
+  the values of the environment variables it read from the operating system,
+  and the expanded file and the savepoint written (s=).
+If none of these have changed since the manifest was written, the expanded file and savepoint are reused,
+and the precompiler is skipped.
+"""
+import hashlib
+import json
+import os
+
+from import_cache import source_fingerprint
+
+MANIFEST_VERSION = 1
+
+
+def file_hash(path):
+  """Return hash of the content of a file, or None if the file does not exist"""
+  if path is None or not os.path.isfile(path):
+    return None
+  with open(path, "rb") as f:
+    return hashlib.sha1(f.read()).hexdigest()
+
+
+class Manifest:
+  """Inputs and outputs of a precompiler run"""
+
+  def __init__(self, expanded_path, source_path, args, read_paths, save_path):
+    self.path = os.path.splitext(expanded_path)[0] + ".manifest.json"
+    self.expanded_path = expanded_path
+    self.source_path = source_path
+    self.save_path = save_path
+    self.settings = {
+      "version": MANIFEST_VERSION,
+      "gamY": source_fingerprint(),
+      "args": list(args),
+      "read": {path: file_hash(path) for path in read_paths},
+    }
+
+  def is_up_to_date(self):
+    """Return True if no inputs or outputs have changed since the manifest was saved"""
+    try:
+      with open(self.path, "r") as f:
+        previous = json.load(f)
+    except (OSError, ValueError):
+      return False
+    return (
+      previous.get("settings") == self.settings
+      and all(file_hash(path) == value for path, value in previous["sources"].items())
+      and all(os.environ.get(key) == value for key, value in previous["environment"].items())
+      and file_hash(self.expanded_path) == previous["expanded"]
+      and file_hash(self.save_path) == previous["save"]
+    )
+
+  def save(self, imported_files, environment_keys):
+    """Save the manifest after the expanded file (and savepoint) have been written"""
+    manifest = {
+      "settings": self.settings,
+      "sources": {path: file_hash(path) for path in [self.source_path, *sorted(imported_files)]},
+      "environment": {key: os.environ.get(key) for key in sorted(environment_keys)},
+      "expanded": file_hash(self.expanded_path),
+      "save": file_hash(self.save_path),
+    }
+    with open(self.path, "w") as f:
+      json.dump(manifest, f, indent=2)
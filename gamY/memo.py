@@ -0,0 +1,76 @@
+"""
+Memoization of the expansions of $LOOP commands and @function calls, used by the token engine.
+Macros such as @set_bounds() or @reset_to(All, _baseline) expand to the same text every time they are called
+with the same arguments, as long as the groups, blocks, functions, and environment variables they read are unchanged.
+
+The precompiler keeps a version stamp of each part of its state, keyed like the dependencies of the import cache,
+e.g. ("group", "g_endo") or ("function", "reset_to"), which is increased whenever that part of the state changes.
+While a command is expanded, the version stamps of the state it reads are recorded (see MemoRecorder).
+The expansion is stored under the text of the command, and is reused as long as all the version stamps are unchanged.
+Only expansions without any effects on the state (definitions of groups, blocks, functions, environment variables,
+or warnings) are stored, so that a stored expansion can be reused without replaying anything.
+
+The memo is bounded, so that the memory used still scales with the largest single expansion (see stream.py):
+expansions larger than MAX_ENTRY_SIZE characters are not stored,
+and the least recently used expansions are dropped once the stored text exceeds MAX_SIZE characters.
+"""
+from collections import OrderedDict
+
+MEMOIZED_COMMANDS = ("loop", "user_function")
+MAX_DEPENDENCIES = 10000  # Expansions reading more parts of the state than this are not stored
+MAX_SIZE = 1 << 24  # Characters of command and expanded text stored in total
+MAX_ENTRY_SIZE = MAX_SIZE // 16  # Characters of expanded text of a single stored expansion
+
+
+class MemoRecorder:
+  """Version stamps of the state read while expanding a command, and whether the expansion had any effects"""
+  __slots__ = ("dependencies", "pure")
+
+  def __init__(self):
+    self.dependencies = {}  # Maps (kind, name) to the version stamp when it was first read
+    self.pure = True
+
+  def read(self, key, version):
+    if key not in self.dependencies:
+      self.dependencies[key] = version
+
+  def write(self):
+    self.pure = False
+
+
+class ExpansionMemo:
+  """Stored expansions by command text, each with the version stamps of the state it depends on"""
+
+  def __init__(self):
+    self.entries = OrderedDict()  # Maps command text to (dependencies, expanded text), least recently used first
+    self.size = 0  # Characters of command and expanded text stored
+    self.hits = 0
+    self.misses = 0
+
+  def lookup(self, command_text, versions):
+    """Return (dependencies, expanded text) stored for the command if its dependencies are unchanged, otherwise None"""
+    entry = self.entries.get(command_text)
+    if entry is not None and all(versions.get(key, 0) == version for key, version in entry[0].items()):
+      self.hits += 1
+      self.entries.move_to_end(command_text)
+      return entry
+    self.misses += 1
+    return None
+
+  def store(self, command_text, recorder, expanded_text):
+    if not recorder.pure or len(recorder.dependencies) > MAX_DEPENDENCIES or len(expanded_text) > MAX_ENTRY_SIZE:
+      return
+    self.remove(command_text)
+    self.entries[command_text] = (recorder.dependencies, expanded_text)
+    self.size += len(command_text) + len(expanded_text)
+    while self.size > MAX_SIZE:
+      self.remove(next(iter(self.entries)))
+
+  def remove(self, command_text):
+    entry = self.entries.pop(command_text, None)
+    if entry is not None:
+      self.size -= len(command_text) + len(entry[1])
+
+  def clear(self):
+    self.entries.clear()
+    self.size = 0
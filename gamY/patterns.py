@@ -54,7 +54,12 @@ PATTERN_STRINGS = {
 
     "model": r"\$Model\s+(.+?)\s+(.*?);",
 
-    "solve": r"\$Solve\s+(.*?);",
+    "solve": r"""
+                        \$Solve
+                        (?:[(\[] ([^)\]]*) [)\]])?   # Optional solve type and model attributes
+                        \s+
+                        (.*?);                  # Equations, blocks, and models
+                    """,
 
     "fix": r"""
                         (\$(?:UN)?FIX)          # Fix or unfix command
@@ -132,17 +137,31 @@ PATTERN_STRINGS = {
 
 }
 
+# Comments. Commands inside comments are ignored.
+COMMENT_PATTERNS = (
+    re.compile(r"^\*.*", re.MULTILINE),  # Lines starting with a star
+    re.compile(r"\#.*", re.MULTILINE),  # End of line comments
+    re.compile(r"^\$ontext.*?\$offtext", re.IGNORECASE | re.MULTILINE | re.DOTALL),  # Block comments
+)
+
 # Compile regex patterns
 PATTERNS = {k: re.compile(v, re.VERBOSE | re.IGNORECASE | re.MULTILINE | re.DOTALL) for k, v in PATTERN_STRINGS.items()}
 # Create combined pattern that matches any of the patterns
 PATTERNS["Any"] = re.compile("|".join(PATTERN_STRINGS.values()), re.VERBOSE | re.IGNORECASE | re.MULTILINE | re.DOTALL)
 
 
-PATTERNS["TopDown"] = re.compile("|".join((  # Remember to also add these to the list in gamY
-        PATTERN_STRINGS["if"],
-        PATTERN_STRINGS["for_loop"],
-        PATTERN_STRINGS["loop"],
-        PATTERN_STRINGS["define_function"],
-    )),
+# Commands that are processed top down, i.e. before any commands nested inside them
+TOP_DOWN_COMMANDS = ("if", "for_loop", "loop", "define_function")  # Remember to also add these to the list in gamY
+
+PATTERNS["TopDown"] = re.compile("|".join(PATTERN_STRINGS[k] for k in TOP_DOWN_COMMANDS),
+    re.VERBOSE | re.IGNORECASE | re.MULTILINE | re.DOTALL
+)
+
+# Patterns used by the tokenizer.
+# Every command starts with one of the characters below, so only these positions need to be tried by the lexer.
+PATTERNS["CommandStart"] = re.compile(r"[$%@]")
+# Same alternatives as the "Any" pattern, but each wrapped in a named group, so that the command matched can be read from match.lastgroup
+PATTERNS["Lexer"] = re.compile(
+    "|".join(f"(?P<{k}>{v}\n)" for k, v in PATTERN_STRINGS.items()),
     re.VERBOSE | re.IGNORECASE | re.MULTILINE | re.DOTALL
 )
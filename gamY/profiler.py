@@ -0,0 +1,144 @@
+"""
+Profiler for the gamY precompiler, used with the --profile option. It records:
+  - wall time, call counts, input bytes, and emitted bytes per command type (e.g. group or loop), imported file,
+    and user function call site (the function or file the function was called from)
+  - hits and misses of memoized $LOOP and @function expansions (token engine only)
+  - time and size of each savepoint read (entries are unpickled lazily, within the commands using them)
+  - peak memory traced by tracemalloc while profiling (unless trace_memory is False)
+Times are inclusive of any commands nested inside a command. The self time of a command type excludes nested commands.
+"""
+import json
+import tracemalloc
+from timeit import default_timer as timer
+
+CATEGORIES = {
+  "commands": "Command",
+  "imports": "Imported file",
+  "function_calls": "Function call site",
+  "savepoints": "Savepoint read",
+}
+
+
+class Profiler:
+  """Collects statistics for each command processed by the precompiler"""
+
+  def __init__(self, file_name, trace_memory=True):
+    self.file_name = file_name
+    self.trace_memory = trace_memory
+    self.stats = {category: {} for category in CATEGORIES}
+    self.memo_stats = {}  # Maps "@function" or "$LOOP <iterable>" to [hits, misses]
+    self.stack = []  # Measurements in progress
+    self.callers = [file_name]  # File or function that commands are currently called from
+    self.start_time = timer()
+    self.total_time = None
+    self.peak_memory = None
+    if trace_memory:
+      if not tracemalloc.is_tracing():
+        tracemalloc.start()
+      tracemalloc.reset_peak()
+
+  def entry(self, category, key):
+    if key not in self.stats[category]:
+      self.stats[category][key] = {"calls": 0, "time": 0.0, "self_time": 0.0, "input_bytes": 0, "emitted_bytes": 0}
+    return self.stats[category][key]
+
+  def start(self, command, name, input_bytes):
+    """
+    Start measuring a command.
+    name is the file name for $IMPORT and the function name for @function calls.
+    """
+    entries = [self.entry("commands", command)]
+    caller = None
+    if command == "import":
+      entries.append(self.entry("imports", name))
+      caller = name
+    elif command == "user_function":
+      entries.append(self.entry("function_calls", f"@{name} from {self.callers[-1]}"))
+      caller = f"@{name}"
+    if caller:
+      self.callers.append(caller)
+    self.stack.append([entries, timer(), 0.0, caller, input_bytes])
+
+  def stop(self, emitted_bytes):
+    """Stop measuring the most recently started command"""
+    entries, start_time, nested_time, caller, input_bytes = self.stack.pop()
+    elapsed = timer() - start_time
+    if self.stack:
+      self.stack[-1][2] += elapsed
+    if caller:
+      self.callers.pop()
+    for entry in entries:
+      entry["calls"] += 1
+      entry["time"] += elapsed
+      entry["self_time"] += elapsed - nested_time
+      entry["input_bytes"] += input_bytes
+      entry["emitted_bytes"] += emitted_bytes
+
+  def record(self, category, key, elapsed, input_bytes):
+    """Record a measurement made outside of the commands, e.g. reading a savepoint"""
+    entry = self.entry(category, key)
+    entry["calls"] += 1
+    entry["time"] += elapsed
+    entry["self_time"] += elapsed
+    entry["input_bytes"] += input_bytes
+
+  def memo(self, key, hit):
+    """Record a lookup of a memoized expansion"""
+    counts = self.memo_stats.setdefault(key, [0, 0])
+    counts[0 if hit else 1] += 1
+
+  def finish(self):
+    """Stop profiling and read the peak memory use"""
+    self.total_time = timer() - self.start_time
+    if self.trace_memory:
+      self.peak_memory = tracemalloc.get_traced_memory()[1]
+      tracemalloc.stop()
+
+  def to_dict(self):
+    return {
+      "file": self.file_name,
+      "total_time": self.total_time,
+      "peak_memory_bytes": self.peak_memory,
+      **self.stats,
+      "memoized_expansions": {key: {"hits": hits, "misses": misses} for key, (hits, misses) in self.memo_stats.items()},
+    }
+
+  def report(self):
+    """Return text report with entries sorted by time"""
+    lines = [
+      f"gamY profile of {self.file_name}",
+      f"Total precompiler time: {self.total_time:.3f} seconds",
+    ]
+    if self.peak_memory is not None:
+      lines.append(f"Peak traced memory: {self.peak_memory / 1e6:.1f} MB")
+    for category, title in CATEGORIES.items():
+      sort_key = "self_time" if category == "commands" else "time"
+      entries = sorted(self.stats[category].items(), key=lambda item: item[1][sort_key], reverse=True)
+      width = max([len(title)] + [len(key) for key, _ in entries])
+      lines += [
+        "",
+        f"{title:<{width}}  {'Calls':>8}  {'Time [s]':>10}  {'Self [s]':>10}  {'Input [kB]':>12}  {'Emitted [kB]':>12}",
+        "-" * (width + 72),
+      ]
+      for key, entry in entries:
+        lines.append(
+          f"{key:<{width}}  {entry['calls']:>8}  {entry['time']:>10.3f}  {entry['self_time']:>10.3f}"
+          f"  {entry['input_bytes'] / 1e3:>12.1f}  {entry['emitted_bytes'] / 1e3:>12.1f}"
+        )
+    if self.memo_stats:
+      entries = sorted(self.memo_stats.items(), key=lambda item: sum(item[1]), reverse=True)
+      title = "Memoized expansion"
+      width = max([len(title)] + [len(key) for key, _ in entries])
+      lines += ["", f"{title:<{width}}  {'Hits':>8}  {'Misses':>8}  {'Hit rate':>8}", "-" * (width + 32)]
+      for key, (hits, misses) in entries:
+        lines.append(f"{key:<{width}}  {hits:>8}  {misses:>8}  {hits / (hits + misses):>8.1%}")
+    return "\n".join(lines) + "\n"
+
+  def save(self, path):
+    """Write the text report to <path>.profile.txt and the statistics to <path>.profile.json"""
+    if self.total_time is None:
+      self.finish()
+    with open(path + ".profile.txt", "w") as f:
+      f.write(self.report())
+    with open(path + ".profile.json", "w") as f:
+      json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,271 @@
+"""
+Savepoint format of the precompiler state, written with the s=<file_name> option and read with the r=<file_name> option.
+The file consists of
+  magic bytes and the length of the header,
+  the header: the format version, the global environment variables, and an index of each section
+    (blocks, groups, group conditions, parameter groups, parameter group conditions, and user functions),
+    with the name, offset, and length of each entry,
+  and the entries, each pickled and compressed separately.
+Members of groups are stored by their name in the "all" group, so that each variable is only pickled once.
+Entries are only unpickled when they are looked up (see LazyDict),
+so a stage only materializes the groups, blocks, and functions it references.
+With the --delta_savepoints option, a savepoint only stores the entries which differ from the savepoint read (r=),
+and references that parent by its relative path and the hash of its content.
+Entries are inherited from the chain of parents when the savepoint is read,
+which fails if a parent has been changed or removed since the delta savepoint was saved.
+Savepoints in the previous format, a single pickled tuple, can still be read.
+"""
+import hashlib
+import os
+import pickle
+import struct
+import sys
+import zlib
+from collections.abc import Mapping
+
+from classes import FoldedDict
+
+MAGIC = b"gamYsave"
+SAVEPOINT_VERSION = 2  # Version 2 added delta savepoints
+HEADER_LENGTH = struct.Struct("<I")
+COMPRESSION_LEVEL = 6
+
+#  Sections of the savepoint, in the order of the previous (tuple) format
+SECTIONS = ("blocks", "groups", "groups_conditions", "pgroups", "pgroups_conditions", "user_functions")
+GROUP_SECTIONS = ("groups", "pgroups")
+
+
+def encode(value, all_group):
+  """
+  Return picklable entry of a value.
+  Mappings are stored as their class and a list of items, where members of the "all" group are stored by their name only.
+  """
+  if not isinstance(value, Mapping):
+    return None, value
+  items = [key if all_group is not None and all_group.get(key) is item else (key, item) for key, item in value.items()]
+  return type(value), items
+
+
+def decode(entry, all_group):
+  """Return value of an entry, looking members of the "all" group up by calling all_group"""
+  cls, items = entry
+  if cls is None:
+    return items
+  value = cls()
+  for item in items:
+    if type(item) is str:
+      value[item] = all_group()[item]
+    elif type(item[1]) is str:
+      value[item[0]] = sys.intern(item[1])  # Conditions of groups, shared by many variables and groups
+    else:
+      value[item[0]] = item[1]
+  return value
+
+
+class Pending:
+  """Location of an entry in a savepoint file, which has not been unpickled yet"""
+  __slots__ = ("data", "offset", "length")
+
+  def __init__(self, data, offset, length):
+    self.data = data
+    self.offset = offset
+    self.length = length
+
+  def bytes(self):
+    return self.data[self.offset:self.offset + self.length]
+
+
+class LazyDict(FoldedDict):
+  """FoldedDict whose values are unpickled from a savepoint when first looked up"""
+  __slots__ = ("_load", "_pending")
+
+  def __init__(self, entries, load):
+    super().__init__(entries)
+    self._load = load
+    self._pending = True  # False once all entries have been unpickled
+
+  def __getitem__(self, key):
+    value = dict.__getitem__(self, key)  # Keys with another case are looked up by FoldedDict.__missing__
+    if type(value) is Pending:
+      value = self._load(value)
+      dict.__setitem__(self, self._folded[key.lower()], value)
+    return value
+
+  def __iter__(self):
+    # Overriding __iter__ makes dict() and ** look items up through __getitem__, rather than copying the Pending entries
+    return dict.__iter__(self)
+
+  def unpickle_all(self):
+    if self._pending:
+      for key in list(dict.keys(self)):
+        self[key]
+      self._pending = False
+
+  def values(self):
+    self.unpickle_all()
+    return dict.values(self)
+
+  def items(self):
+    self.unpickle_all()
+    return dict.items(self)
+
+  def raw_items(self):
+    """Like items(), but with the Pending location of entries which have not been unpickled"""
+    return list(dict.items(self))
+
+  def copy(self):
+    return FoldedDict(self.items())
+
+  def __reduce__(self):
+    return FoldedDict, (list(self.items()),)
+
+
+class Index:
+  """Index of a savepoint file in the current format, used as the parent of delta savepoints"""
+  __slots__ = ("path", "hash", "globals", "sections")
+
+  def __init__(self, path, file_hash, global_variables, sections):
+    self.path = path
+    self.hash = file_hash
+    self.globals = global_variables
+    self.sections = sections  # Maps section name to list of (key, Pending location of the entry)
+
+
+def save(path, sections, global_variables, parent=None):
+  """
+  Write sections (dict of section name and mapping) and dict of global environment variables to savepoint file.
+  If parent is the Index of the savepoint read, only the entries which differ from the parent are written,
+  and the parent is referenced by its relative path and hash.
+  """
+  if parent is not None and os.path.abspath(parent.path) == os.path.abspath(path):
+    parent = None  # A savepoint cannot be saved relative to the file it replaces
+  inherited = {section: {} for section in SECTIONS}
+  if parent is not None:
+    for section in SECTIONS:
+      inherited[section] = {key.lower(): location for key, location in parent.sections[section]}
+
+  index, entries, offset = {}, [], 0
+  for section in SECTIONS:
+    mapping = sections[section]
+    all_group = None
+    index[section] = []
+    for key, value in (mapping.raw_items() if isinstance(mapping, LazyDict) else mapping.items()):
+      location = inherited[section].get(key.lower())
+      if location is not None and value is location:  # Never looked up since the parent was read
+        index[section].append((key, None, None))
+        continue
+      if type(value) is Pending:  # Entry of a savepoint which is not the parent, copied without unpickling
+        data = bytes(value.bytes())
+      else:
+        if all_group is None and section in GROUP_SECTIONS and key.lower() != "all" and "all" in mapping:
+          all_group = mapping["all"]
+        entry = encode(value, None if key.lower() == "all" else all_group)
+        data = zlib.compress(pickle.dumps(entry, pickle.HIGHEST_PROTOCOL), COMPRESSION_LEVEL)
+      if location is not None and location.bytes() == data:
+        index[section].append((key, None, None))
+      else:
+        index[section].append((key, offset, len(data)))
+        entries.append(data)
+        offset += len(data)
+
+  header = {"version": SAVEPOINT_VERSION, "globals": global_variables, "index": index}
+  if parent is not None:
+    try:
+      parent_path = os.path.relpath(parent.path, os.path.dirname(os.path.abspath(path)))
+    except ValueError:  # On Windows, paths on different drives cannot be relative
+      parent_path = os.path.abspath(parent.path)
+    header["parent"] = {"path": parent_path, "hash": parent.hash}
+  header = pickle.dumps(header, pickle.HIGHEST_PROTOCOL)
+  with open(path, "wb") as f:
+    f.write(MAGIC + HEADER_LENGTH.pack(len(header)))
+    f.write(header)
+    for data in entries:
+      f.write(data)
+
+
+def read_index(path):
+  """
+  Return Index of savepoint file, resolving entries inherited from the parents of delta savepoints,
+  or None if the file is in the previous format.
+  """
+  with open(path, "rb") as f:
+    data = f.read()
+  if not data.startswith(MAGIC):
+    return None
+
+  start = len(MAGIC) + HEADER_LENGTH.size
+  header_length, = HEADER_LENGTH.unpack_from(data, len(MAGIC))
+  header = pickle.loads(data[start:start + header_length])
+  if header["version"] > SAVEPOINT_VERSION:
+    raise ValueError(f"Savepoint format version {header['version']} is newer than this version of gamY ({SAVEPOINT_VERSION})")
+  view = memoryview(data)[start + header_length:]
+
+  inherited = {}
+  if "parent" in header:
+    parent_path = os.path.join(os.path.dirname(path), header["parent"]["path"])
+    try:
+      parent = read_index(parent_path)
+    except FileNotFoundError:
+      raise ValueError(f"Parent savepoint of {path} was not found: {parent_path}")
+    if parent is None or parent.hash != header["parent"]["hash"]:
+      raise ValueError(f"Parent savepoint of {path} has changed since it was saved: {parent_path}")
+    inherited = {section: {key.lower(): location for key, location in parent.sections[section]} for section in SECTIONS}
+
+  sections = {
+    section: [
+      (key, Pending(view, offset, length) if offset is not None else inherited[section][key.lower()])
+      for key, offset, length in header["index"][section]
+    ]
+    for section in SECTIONS
+  }
+  return Index(path, hashlib.sha1(data).hexdigest(), header["globals"], sections)
+
+
+def read(path):
+  """
+  Read savepoint file and return dict of sections, dict of global environment variables, and the Index of the file.
+  Sections read from the current format are LazyDicts.
+  Sections read from the previous format are unpickled at once (as FoldedDicts), and the Index is None.
+
+  >>> import tempfile
+  >>> directory = tempfile.mkdtemp()
+  >>> variable = ("qY", "[s_,t]")
+  >>> sections = {section: FoldedDict() for section in SECTIONS}
+  >>> sections["groups"]["All"] = FoldedDict(qY=variable)
+  >>> sections["groups"]["G_endo"] = FoldedDict(qY=variable)
+  >>> sections["groups_conditions"]["G_endo"] = FoldedDict(qY="(tx0[t])")
+  >>> save(os.path.join(directory, "base"), sections, {"stage": "equations"})
+  >>> base, global_variables, index = read(os.path.join(directory, "base"))
+  >>> base["groups"]["g_endo"]["QY"] is base["groups"]["all"]["qY"], base["groups_conditions"]["G_endo"], global_variables
+  (True, {'qY': '(tx0[t])'}, {'stage': 'equations'})
+
+  With a parent, only the changed entries are written, and the others are inherited from the parent when read:
+
+  >>> base["groups_conditions"]["G_endo"] = FoldedDict(qY="(tx1[t])")
+  >>> save(os.path.join(directory, "delta"), base, {}, index)
+  >>> delta, _, _ = read(os.path.join(directory, "delta"))
+  >>> dict(delta["groups"]) == dict(base["groups"]), delta["groups_conditions"]["g_endo"]
+  (True, {'qY': '(tx1[t])'})
+  >>> os.path.getsize(os.path.join(directory, "delta")) < os.path.getsize(os.path.join(directory, "base"))
+  True
+  >>> import shutil; shutil.rmtree(directory)
+  """
+  index = read_index(path)
+  if index is None:
+    with open(path, "rb") as f:
+      blocks, groups, groups_conditions, pgroups, pgroups_conditions, global_variables, user_functions = pickle.load(f)
+    sections = (blocks, groups, groups_conditions, pgroups, pgroups_conditions, user_functions)
+    return {section: FoldedDict(mapping) for section, mapping in zip(SECTIONS, sections)}, global_variables, None
+
+  sections = {}
+
+  def loader(section):
+    all_group = lambda: sections[section]["all"]
+
+    def load(pending):
+      return decode(pickle.loads(zlib.decompress(pending.bytes())), all_group)
+    return load
+
+  for section in SECTIONS:
+    sections[section] = LazyDict(index.sections[section], loader(section))
+  return sections, index.globals, index
@@ -0,0 +1,55 @@
+"""
+Streaming output of the expanded file, used by the token engine when writing the .gmy file (see Precompiler.write).
+The output buffer of the token engine is only ever appended to, so emitted text is final and can be written right away.
+Pending text is written in chunks of about CHUNK_SIZE characters, with dollar commands dedented (see Precompiler.dedent_dollar),
+so the memory used scales with the largest single command expansion rather than with the whole file.
+
+The dedent pattern can span lines, e.g. blank lines followed by an indented $command,
+so the end of each chunk, from the last character which is neither whitespace nor a dollar sign, is held back
+and written with the next chunk. The output is the same as dedenting the whole file at once.
+"""
+from classes import TextBuffer
+
+CHUNK_SIZE = 1 << 20
+
+
+def split_point(text):
+  """Return position of the last character which is neither whitespace nor a dollar sign, or 0 if there is none"""
+  position = len(text)
+  while position > 0 and (text[position - 1].isspace() or text[position - 1] == "$"):
+    position -= 1
+  return max(position - 1, 0)
+
+
+class StreamBuffer(TextBuffer):
+  """TextBuffer which writes its text to a file, transformed by transform, once CHUNK_SIZE characters are pending"""
+  __slots__ = ("file", "transform", "written")
+
+  def __init__(self, file, transform):
+    self.file = file
+    self.transform = transform
+    self.written = 0  # Characters written to the file. The length of the buffer counts all characters appended.
+    super().__init__()
+
+  def append(self, text):
+    TextBuffer.append(self, text)
+    if self.length - self.written >= CHUNK_SIZE:
+      self.flush()
+    return self
+
+  __iadd__ = append
+
+  def flush(self, final=False):
+    """Write the pending text, except for the end that may be dedented together with the next chunk"""
+    text = "".join(self.segments)
+    end = len(text) if final else split_point(text)
+    if end:
+      self.file.write(self.transform(text[:end]))
+      self.written += end
+    self.segments = [text[end:]] if end < len(text) else []
+
+  def close(self):
+    self.flush(final=True)
+
+  def __str__(self):
+    raise TypeError("The text of a StreamBuffer has been written to a file")
@@ -0,0 +1,112 @@
+"""
+Compiled templates of $LOOP bodies, used by Precompiler.loop_over_variables and Precompiler.loop_over_equations.
+The body of a loop is split once into literal text and placeholders, e.g. {name}, {sets}, or {conditions},
+and the set filters of the {$} operator, e.g. {sets}{$}[+t,-a,<t>t1], are parsed when the template is compiled.
+A template is rendered for all the variables (or equations) of a loop at once, one column per placeholder:
+set filters are only applied once per distinct set list, and the text is joined once.
+The output is the same as substituting each placeholder pattern in turn for each variable.
+"""
+import itertools
+from functools import lru_cache
+import re
+
+VARIABLE_PLACEHOLDERS = re.compile(r"""
+  (?P<sets>\{SETS?\}?(?P<filter>\{\$\}\[[^$=\n;{}]+\])?)
+  |(?P<name>\{NAME\})
+  |(?P<conditions>\{(?:SUBSET|CONDITION)S?\})  #  "SUBSETS" will be depreciated
+  |(?P<text>\{text\})
+""", re.IGNORECASE | re.VERBOSE)
+
+EQUATION_PLACEHOLDERS = re.compile(r"""
+  (?P<sets>\{SETS\}?(?P<filter>\{\$\}\[[^=\n;{}]+\])?)
+  |(?P<name>\{NAME\})
+  |(?P<conditions>\{(?:SUBSET|CONDITION)S?\})
+  |(?P<LHS>\{LHS\})
+  |(?P<RHS>\{RHS\})
+""", re.IGNORECASE | re.VERBOSE)
+
+
+class SetFilter:
+  """
+  Filter of the {$} operator, e.g. [+t,-a,<t>t1], parsed into the sets to add, subtract, and replace.
+  Equations remove an added set which is already present as a subset, where variables keep it.
+  """
+  __slots__ = ("add_sets", "subtract_sets", "replace_sets", "equations", "results")
+
+  def __init__(self, filter, equations=False):
+    self.add_sets, self.subtract_sets, self.replace_sets = [], [], []
+    for f in filter[4:-1].replace(" ", "").split(","):
+      if f[0] == "+":
+        self.add_sets.append(f[1:])
+      elif f[0] == "-":
+        self.subtract_sets.append(f[1:])
+      else:
+        self.replace_sets.append(f)
+    self.equations = equations
+    self.results = {}  # Filtered sets of each set list, as many variables share the same sets
+
+  def __call__(self, sets):
+    if sets not in self.results:
+      self.results[sets] = self.apply(sets)
+    return self.results[sets]
+
+  def apply(self, sets):
+    sets = sets[1:-1].replace(" ", "").split(",")  # Remove parentheses and whitespace and splits sets into list
+    filtered_sets = sets + self.add_sets
+    for s in sets:
+      for f in self.add_sets:
+        if f"[{f}]" in s:  # If the variable's set is a subset of the add set, or if the add set is already present, don't add it
+          if self.equations:
+            filtered_sets.remove(f)
+        elif f"[{s}]" in f:
+          filtered_sets.remove(s)
+
+      for f in self.subtract_sets:
+        if s == f or f"[{f}]" in s:  # If the variable's sets is a subset of the filter set, the set should be removed
+          filtered_sets.remove(s)
+
+      for f in self.replace_sets:
+        if f"<{s}>" in f:  # Replace set surrounded by < > with the filter
+          filtered_sets[filtered_sets.index(s)] = f.replace(f"<{s}>", "")
+        elif f"[{s}]" in f:
+          filtered_sets.remove(s)
+          filtered_sets.append(f)
+
+    sets = []
+    for s in filtered_sets:
+      if s != "" and s not in sets:
+        sets.append(s)
+    sets = "[" + ",".join(sets) + "]"
+    if sets == "[]":
+      sets = ""
+    return sets
+
+
+class Template:
+  """Body of a $LOOP split into literal text and placeholders, as (literal text, field name, SetFilter or None)"""
+  __slots__ = ("parts", "tail")
+
+  def __init__(self, expression, equations=False):
+    pattern = EQUATION_PLACEHOLDERS if equations else VARIABLE_PLACEHOLDERS
+    self.parts = []
+    position = 0
+    for match in pattern.finditer(expression):
+      filter = match.group("filter")
+      self.parts.append((expression[position:match.start()], match.lastgroup, SetFilter(filter, equations) if filter else None))
+      position = match.end()
+    self.tail = expression[position:]
+
+  def render(self, fields):
+    """Return text of the template for each record, where fields maps each field name to a list of values by record"""
+    columns = []
+    for literal, field, set_filter in self.parts:
+      columns.append(itertools.repeat(literal))
+      columns.append(map(set_filter, fields["sets"]) if set_filter else fields[field])
+    columns.append(itertools.repeat(self.tail, len(fields["name"])))
+    return "".join(itertools.chain.from_iterable(zip(*columns)))
+
+
+@lru_cache(maxsize=256)
+def compile_template(expression, equations=False):
+  """Return Template of a loop body, reused when the same loop is expanded again, e.g. in a user function"""
+  return Template(expression, equations)
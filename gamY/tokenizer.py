@@ -0,0 +1,120 @@
+"""
+Tokenizer used by the token engine of the gamY precompiler.
+The source is scanned once from left to right and split into literal text and commands.
+Commands are identified using the same regex patterns as the regex engine, so that both engines agree on the extent of each command.
+Flow control commands ($IF, $FOR, $LOOP, and $FUNCTION) are kept as unparsed ranges, as their content must be processed top down.
+Their headers (e.g. the id, condition, and body of an $IF) are read from the groups of the lexer match (see Command.groups),
+so that they are not matched again when the command is processed.
+All other commands (e.g. $GROUP or $BLOCK) are tokenized recursively, as commands nested inside them must be processed first.
+
+Comments are found once per text buffer and kept as an interval index (CommentMask).
+The patterns are matched against a view of the text where the special characters inside comments are masked,
+while the text passed on to the commands is sliced from the original text using the same offsets.
+"""
+from patterns import PATTERNS, TOP_DOWN_COMMANDS, COMMENT_PATTERNS
+
+#  Characters that are hidden from the command patterns inside comments, and the character replacing them
+MASK_TABLE = str.maketrans({"$": "¤", ";": "¤", "%": "¤", "@": "¤"})
+
+
+class CommentMask:
+  """Interval index of the comments in a text buffer"""
+  __slots__ = ("starts", "ends", "view")
+
+  def __init__(self, text, comment_patterns=COMMENT_PATTERNS):
+    # End of line comments are masked before looking for block comments, e.g. '# $offtext' does not end a block comment
+    *line_patterns, block_pattern = comment_patterns
+    spans = [m.span() for pattern in line_patterns for m in pattern.finditer(text)]
+    self.set_spans(spans)
+    view = self.masked(text)
+    spans += [m.span() for m in block_pattern.finditer(view)]
+    self.set_spans(spans)
+    self.view = self.masked(text)
+
+  def set_spans(self, spans):
+    """Merge overlapping spans into sorted, disjoint intervals"""
+    self.starts, self.ends = [], []
+    for start, end in sorted(spans):
+      if self.ends and start <= self.ends[-1]:
+        self.ends[-1] = max(self.ends[-1], end)
+      else:
+        self.starts.append(start)
+        self.ends.append(end)
+
+  def masked(self, text):
+    """Return copy of text with special characters inside comments replaced. Offsets are unchanged."""
+    if not self.starts:
+      return text
+    chunks = []
+    prev_end = 0
+    for start, end in zip(self.starts, self.ends):
+      chunks.append(text[prev_end:start])
+      chunks.append(text[start:end].translate(MASK_TABLE))
+      prev_end = end
+    chunks.append(text[prev_end:])
+    return "".join(chunks)
+
+
+class Command:
+  """Node in the command tree"""
+  __slots__ = ("kind", "match", "text", "children", "groups")
+
+  def __init__(self, match, text, patterns=PATTERNS):
+    self.kind = match.lastgroup  # Name of the pattern matched, e.g. "group"
+    self.match = match  # Match in the masked view of the text
+    self.text = text[match.start():match.end()]
+    if self.kind in TOP_DOWN_COMMANDS:
+      self.children = None
+      # The groups of the command's own pattern follow the group named after the command in the lexer pattern
+      first = patterns["Lexer"].groupindex[self.kind] + 1
+      self.groups = tuple(
+        None if start < 0 else self.text[start - match.start():end - match.start()]
+        for start, end in map(match.span, range(first, first + patterns[self.kind].groups))
+      )
+    else:
+      self.groups = None
+      # The first character is skipped so that the command does not match itself
+      self.children = tokenize(text, match.start() + 1, match.end(), patterns, view=match.string)
+
+  @property
+  def start(self):
+    return self.match.start()
+
+  @property
+  def end(self):
+    return self.match.end()
+
+  def __repr__(self):
+    return f"Command({self.kind}, {self.start}, {self.end})"
+
+
+def tokenize(text, pos=0, endpos=None, patterns=PATTERNS, view=None):
+  """
+  Return list of nodes, either literal strings or Command objects, covering text[pos:endpos].
+  Commands are matched in view, a copy of text with comments masked (see CommentMask).
+  """
+  if view is None:
+    view = CommentMask(text).view
+  if endpos is None:
+    endpos = len(text)
+  command_start = patterns["CommandStart"]
+  lexer = patterns["Lexer"]
+
+  nodes = []
+  literal_start = pos
+  while True:
+    candidate = command_start.search(view, pos, endpos)
+    if candidate is None:
+      break
+    pos = candidate.start()
+    match = lexer.match(view, pos, endpos)
+    if match is None:
+      pos += 1
+      continue
+    if literal_start < pos:
+      nodes.append(text[literal_start:pos])
+    nodes.append(Command(match, text, patterns))
+    pos = literal_start = match.end()
+  if literal_start < endpos:
+    nodes.append(text[literal_start:endpos])
+  return nodes